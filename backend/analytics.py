@@ -0,0 +1,247 @@
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+UNCATEGORIZED = "Uncategorized"
+MONTHS_PER_YEAR = 12
+
+
+def month_index(year: int, month: int) -> int:
+    """Months since January 1970, the unit of numpy's datetime64[M]"""
+    return (year - 1970) * MONTHS_PER_YEAR + (month - 1)
+
+
+def parse_month(value: str) -> int:
+    """
+    Parse a 'YYYY-MM' string into a month index
+
+    Raises:
+        ValueError: If the value isn't a valid month
+    """
+    try:
+        year, month = (int(part) for part in value.split("-"))
+    except (AttributeError, ValueError):
+        raise ValueError(f"Invalid month '{value}'. Expected YYYY-MM")
+    if not 1 <= month <= 12:
+        raise ValueError(f"Invalid month '{value}'. Expected YYYY-MM")
+    return month_index(year, month)
+
+
+def format_month(index: int) -> str:
+    """Format a month index as 'YYYY-MM'"""
+    year, month = divmod(int(index), MONTHS_PER_YEAR)
+    return f"{1970 + year:04d}-{month + 1:02d}"
+
+
+def _parse_dates(values: Sequence[Optional[str]]) -> np.ndarray:
+    """Parse ISO dates into days since 1970; missing or invalid dates become NaT"""
+    try:
+        return np.array(values, dtype="datetime64[D]")
+    except ValueError:
+        parsed = []
+        for value in values:
+            try:
+                parsed.append(np.datetime64(date.fromisoformat(value), "D"))
+            except (TypeError, ValueError):
+                parsed.append(np.datetime64("NaT"))
+        return np.array(parsed, dtype="datetime64[D]")
+
+
+def _cents_array(values: Sequence[Optional[int]]) -> np.ndarray:
+    """Integer cents as an int64 array; missing amounts become 0"""
+    try:
+        return np.array(values, dtype=np.int64)
+    except TypeError:
+        return np.array([value or 0 for value in values], dtype=np.int64)
+
+
+def _encode(values: Iterable[Optional[str]], index: Dict[str, int], default: str) -> np.ndarray:
+    """Dictionary-encode strings into integer codes, adding new values to index"""
+    return np.fromiter(
+        (index.setdefault(value or default, len(index)) for value in values),
+        dtype=np.int32
+    )
+
+
+class TransactionColumns:
+    """
+    Columnar copy of transactions for vectorized aggregation.
+
+    Each transaction is a position in four parallel arrays: days (days since
+    1970-01-01), cents (signed amount in integer cents), category_codes and
+    account_codes (indices into the categories and accounts name lists).
+    Transactions without a valid date are dropped.
+    """
+
+    def __init__(self,
+                 days: np.ndarray,
+                 cents: np.ndarray,
+                 category_codes: np.ndarray,
+                 categories: List[str],
+                 account_codes: np.ndarray,
+                 accounts: List[str]):
+        self.days = days
+        self.cents = cents
+        self.category_codes = category_codes
+        self.categories = categories
+        self.account_codes = account_codes
+        self.accounts = accounts
+        self.months = days.astype("datetime64[M]").astype(np.int64)
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    @classmethod
+    def from_rows(cls, batches: Iterable[Sequence[Tuple]]) -> "TransactionColumns":
+        """
+        Build columns from batches of (date, amount_cents, category, account_id) tuples,
+        such as TransactionStore.iter_columns() yields
+        """
+        category_index: Dict[str, int] = {}
+        account_index: Dict[str, int] = {}
+        parts = []
+
+        for rows in batches:
+            if not rows:
+                continue
+            days = _parse_dates([row[0] for row in rows])
+            valid = ~np.isnat(days)
+            parts.append((
+                days[valid].astype(np.int64),
+                _cents_array([row[1] for row in rows])[valid],
+                _encode((row[2] for row in rows), category_index, UNCATEGORIZED)[valid],
+                _encode((row[3] for row in rows), account_index, "")[valid],
+            ))
+
+        if parts:
+            days, cents, category_codes, account_codes = (np.concatenate(column) for column in zip(*parts))
+        else:
+            days, cents = np.empty(0, np.int64), np.empty(0, np.int64)
+            category_codes, account_codes = np.empty(0, np.int32), np.empty(0, np.int32)
+
+        return cls(
+            days.astype("datetime64[D]"),
+            cents,
+            category_codes,
+            list(category_index),
+            account_codes,
+            list(account_index)
+        )
+
+    @classmethod
+    def from_store(cls, store) -> "TransactionColumns":
+        """Load every transaction from a TransactionStore"""
+        return cls.from_rows(store.iter_columns())
+
+    def month_range(self) -> Optional[Tuple[int, int]]:
+        """First and last month index with transactions, or None if empty"""
+        if len(self) == 0:
+            return None
+        return int(self.months.min()), int(self.months.max())
+
+
+def _trailing_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Mean of each row and up to window - 1 rows before it, along axis 0"""
+    sums = np.cumsum(values, axis=0, dtype=np.float64)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts = np.minimum(np.arange(1, len(values) + 1), window)
+    return sums / counts.reshape((-1,) + (1,) * (values.ndim - 1))
+
+
+def _year_over_year(values: np.ndarray) -> np.ndarray:
+    """Change from the same month a year earlier, along axis 0 (zero for the first year)"""
+    changes = np.zeros_like(values)
+    changes[MONTHS_PER_YEAR:] = values[MONTHS_PER_YEAR:] - values[:-MONTHS_PER_YEAR]
+    return changes
+
+
+def _dollars(cents: np.ndarray) -> List:
+    return np.round(cents / 100, 2).tolist()
+
+
+def spending_trends(columns: TransactionColumns,
+                    start_month: int,
+                    end_month: int,
+                    window: int = 3,
+                    account_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Monthly spending per category with trailing averages and year-over-year changes
+
+    Args:
+        columns: Transactions to aggregate
+        start_month: First month index to report (see month_index)
+        end_month: Last month index to report, inclusive
+        window: Number of months in the trailing average
+        account_ids: Only include these accounts (optional)
+
+    Returns:
+        Dict: months ('YYYY-MM' labels), categories (per-category spending,
+        rolling_average and yoy_change lists aligned with months, largest
+        spenders first) and totals (the same series over all categories, plus
+        income). Amounts are in dollars; yoy_change is None for months with no
+        data a year earlier.
+    """
+    # Aggregate enough earlier months that the first reported month has a full
+    # trailing window and a year-over-year comparison
+    history = max(MONTHS_PER_YEAR, window - 1)
+    first = start_month - history
+    n_months = end_month - first + 1
+    n_categories = len(columns.categories)
+
+    offsets = columns.months - first
+    mask = (offsets >= 0) & (offsets < n_months)
+    if account_ids is not None:
+        wanted = [columns.accounts.index(a) for a in account_ids if a in columns.accounts]
+        mask &= np.isin(columns.account_codes, wanted)
+
+    offsets = offsets[mask]
+    cents = columns.cents[mask]
+    codes = columns.category_codes[mask]
+
+    # bincount sums in float64, which is exact for integer cents below 2**53
+    spending = np.bincount(
+        offsets * n_categories + codes,
+        weights=np.where(cents < 0, -cents, 0),
+        minlength=n_months * n_categories
+    ).reshape(n_months, n_categories)
+    spending = np.rint(spending).astype(np.int64)
+    income = np.rint(np.bincount(
+        offsets, weights=np.where(cents > 0, cents, 0), minlength=n_months
+    )).astype(np.int64)
+
+    rolling = _trailing_mean(spending, window)
+    yoy = _year_over_year(spending)
+
+    # No year-over-year change for months whose prior year predates the data
+    data_range = columns.month_range()
+    first_data_month = data_range[0] if data_range else end_month + 1
+    reported = slice(history, n_months)
+    has_prior_year = (np.arange(start_month, end_month + 1) - MONTHS_PER_YEAR) >= first_data_month
+
+    def yoy_list(values: np.ndarray) -> List:
+        return [change if has else None for change, has in zip(_dollars(values), has_prior_year)]
+
+    totals = spending.sum(axis=1)
+    category_totals = spending[reported].sum(axis=0)
+    order = [code for code in np.argsort(-category_totals, kind="stable") if category_totals[code] > 0]
+
+    return {
+        "months": [format_month(index) for index in range(start_month, end_month + 1)],
+        "categories": [
+            {
+                "category": columns.categories[code],
+                "total": _dollars(category_totals[code]),
+                "spending": _dollars(spending[reported, code]),
+                "rolling_average": _dollars(rolling[reported, code]),
+                "yoy_change": yoy_list(yoy[reported, code]),
+            }
+            for code in order
+        ],
+        "totals": {
+            "spending": _dollars(totals[reported]),
+            "income": _dollars(income[reported]),
+            "rolling_average": _dollars(_trailing_mean(totals, window)[reported]),
+            "yoy_change": yoy_list(_year_over_year(totals)[reported]),
+        },
+    }
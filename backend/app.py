@@ -1,24 +1,39 @@
 import os
 import json
-from datetime import datetime
-from typing import List, Dict, Optional, Any, Union
-from fastapi import FastAPI, HTTPException, Depends, Header, Request, Body
+import asyncio
+import hashlib
+from datetime import datetime, date, timedelta
+from typing import List, Optional, Union
+from fastapi import FastAPI, HTTPException, Depends, Header, Request, Body, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, HTMLResponse, FileResponse
+from fastapi.responses import JSONResponse, HTMLResponse, FileResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.openapi.utils import get_openapi
 from pathlib import Path
-from pydantic import BaseModel, Field
 import requests
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
+import httpx
+import ssl
+import threading
 import uuid
+import functools
+from contextlib import contextmanager
 import uvicorn
 import yaml
+from config import Config
+from models import (
+    Category, CategoryChanges, CategoryUpdate, Mapping, MappingChanges, TellerEnrollment,
+    TransactionBatch, TransactionCategory
+)
+from sheets_client import GoogleSheetsClient
 from teller_token_manager import TellerTokenManager
-from dotenv import load_dotenv
-
-load_dotenv()
+from export_queue import ExportQueue
+from sheet_backend import LocalSheetBackend
+from persistence import JsonFile, lock_for_process
+from response_cache import ResponseCache
+from state_store import StateStore
+from transaction_store import TransactionStore
+from analytics import TransactionColumns, format_month, parse_month, spending_trends
+from category_matcher import RuleMatcher, normalize_description, parse_cents
 
 # Initialize FastAPI app
 app = FastAPI(title="Personal Budgeting API", 
@@ -50,19 +65,6 @@ app.add_middleware(
 )
 
 
-# Configuration
-class Config:
-    TELLER_BASE_URL = os.environ.get('TELLER_BASE_URL', 'https://api.teller.io')
-    CERT_PATH = os.environ.get('TELLER_CERT_PATH')
-    KEY_PATH = os.environ.get('TELLER_KEY_PATH')
-    GOOGLE_SHEET_ID = os.environ.get('GOOGLE_SHEET_ID')
-    GOOGLE_CREDS_PATH = os.environ.get('GOOGLE_CREDS_PATH')
-    CATEGORIES_FILE = os.environ.get('CATEGORIES_FILE', 'categories.json')
-    TRANSACTION_MAPPING_FILE = os.environ.get('TRANSACTION_MAPPING_FILE', 'transaction_mappings.json')
-    CREDS_DIR = os.environ.get('CREDS_DIR', 'creds')
-    STATIC_DIR = os.environ.get('STATIC_DIR', 'static')
-    HTML_TEMPLATE_DIR = os.environ.get('HTML_TEMPLATE_DIR', 'templates')
-
 # Set up static file serving
 static_dir = Path(Config.STATIC_DIR)
 templates_dir = Path(Config.HTML_TEMPLATE_DIR)
@@ -167,385 +169,284 @@ setup_static_files()
 # Mount the static directory
 app.mount("/static", StaticFiles(directory=Config.STATIC_DIR), name="static")
 
-# Pydantic models
-class Category(BaseModel):
-    id: Optional[str] = None
-    name: str
-    color: Optional[str] = None
-
-class CategoryUpdate(BaseModel):
-    name: Optional[str] = None
-    color: Optional[str] = None
-
-class Mapping(BaseModel):
-    pattern: str
-    category_id: str
-
-class Transaction(BaseModel):
-    id: str
-    date: str
-    account_id: str
-    account_name: str
-    description: str
-    amount: str
-    category: Optional[str] = None
-    notes: Optional[str] = None
-
-class TransactionBatch(BaseModel):
-    transactions: List[Transaction]
-
-class TellerEnrollment(BaseModel):
-    accessToken: str
-    user: Dict[str, Any]
-    enrollment: Dict[str, Any]
-    signatures: Optional[List[str]] = None
-
-class TellerTokenInfo(BaseModel):
-    institution_name: str
-    access_token: Optional[str] = None
-    institution_id: Optional[str] = None
-    user_id: Optional[str] = None
-    enrollment_id: Optional[str] = None
+# Teller connection pool
+_teller_ssl_context = None
+_async_teller_client = None
+_async_teller_client_loop = None
+# Accounts, details and balances responses shared by all AsyncTellerClient instances
+teller_cache = ResponseCache(Config.TELLER_CACHE_SIZE)
+
+def get_teller_ssl_context():
+    """Return the SSL context holding the Teller client certificate, or None if not configured"""
+    global _teller_ssl_context
+    if _teller_ssl_context is None and Config.CERT_PATH and Config.KEY_PATH:
+        ssl_context = ssl.create_default_context(cafile=requests.certs.where())
+        ssl_context.load_cert_chain(Config.CERT_PATH, Config.KEY_PATH)
+        _teller_ssl_context = ssl_context
+    return _teller_ssl_context
+
+def get_async_teller_client():
+    """Return the process-wide pooled httpx client used by AsyncTellerClient"""
+    global _async_teller_client, _async_teller_client_loop
+    # Pooled connections belong to one event loop, so start a new pool if the loop changed
+    loop = asyncio.get_running_loop()
+    if _async_teller_client is None or _async_teller_client_loop is not loop:
+        _async_teller_client_loop = loop
+        _async_teller_client = httpx.AsyncClient(
+            verify=get_teller_ssl_context() or True,
+            timeout=httpx.Timeout(Config.TELLER_READ_TIMEOUT, connect=Config.TELLER_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=Config.TELLER_POOL_SIZE,
+                max_keepalive_connections=Config.TELLER_POOL_SIZE
+            )
+        )
+    return _async_teller_client
+
+class TellerError(Exception):
+    """Raised by AsyncTellerClient.iter_transactions when a page request fails"""
+    def __init__(self, error):
+        super().__init__(error['error'])
+        self.error = error
+
+def _transaction_page_params(page_size, from_id, since):
+    params = {'count': page_size}
+    if from_id:
+        params['from_id'] = from_id
+    if since:
+        params['start_date'] = since
+    return params
+
+def _trim_transaction_page(page, page_size, since):
+    """
+    Drop transactions older than since from a page (Teller returns newest first)
+    and report whether this was the last page
+    """
+    if since:
+        kept = [tx for tx in page if (tx.get('date') or '') >= since]
+        if len(kept) < len(page):
+            return kept, True
+    return page, len(page) < page_size
 
 # Teller client
-class TellerClient:
+class AsyncTellerClient:
+    """
+    Teller API client. Requests go through a shared httpx.AsyncClient so a
+    slow Teller call doesn't block other requests on the event loop. Errors
+    are returned as {'error': ..., 'status_code': ...} dicts.
+    
+    Accounts, account details and balances are cached per access token for
+    TELLER_CACHE_*_TTL seconds; pass refresh=True to bypass the cache.
+    """
     def __init__(self, access_token=None):
         self.base_url = Config.TELLER_BASE_URL
-        self.cert = (Config.CERT_PATH, Config.KEY_PATH) if Config.CERT_PATH and Config.KEY_PATH else None
         self.access_token = access_token
 
-    def list_accounts(self):
-        return self._request('GET', '/accounts')
+    async def list_accounts(self, refresh=False):
+        return await teller_cache.get(
+            self.access_token, 'accounts', None, Config.TELLER_CACHE_ACCOUNTS_TTL,
+            lambda: self._request('GET', '/accounts'), refresh=refresh
+        )
+
+    async def get_account_details(self, account_id, refresh=False):
+        return await teller_cache.get(
+            self.access_token, 'details', account_id, Config.TELLER_CACHE_DETAILS_TTL,
+            lambda: self._request('GET', f'/accounts/{account_id}/details'), refresh=refresh
+        )
 
-    def get_account_details(self, account_id):
-        return self._request('GET', f'/accounts/{account_id}/details')
+    async def get_account_balances(self, account_id, refresh=False):
+        return await teller_cache.get(
+            self.access_token, 'balances', account_id, Config.TELLER_CACHE_BALANCES_TTL,
+            lambda: self._request('GET', f'/accounts/{account_id}/balances'), refresh=refresh
+        )
 
-    def get_account_balances(self, account_id):
-        return self._request('GET', f'/accounts/{account_id}/balances')
+    async def list_transactions(self, account_id, start_date=None):
+        params = {'start_date': start_date} if start_date else None
+        return await self._request('GET', f'/accounts/{account_id}/transactions', params=params)
 
-    def list_transactions(self, account_id):
-        return self._request('GET', f'/accounts/{account_id}/transactions')
+    async def iter_transactions(self, account_id, page_size=None, since=None):
+        """
+        Yield an account's transactions one page at a time, newest first,
+        following Teller's from_id cursor. Only one page is held in memory.
+        
+        Args:
+            account_id: The Teller account ID
+            page_size: Transactions per request (defaults to TELLER_PAGE_SIZE)
+            since: Stop at transactions older than this ISO date (optional)
+        
+        Raises:
+            TellerError: If a page request fails
+        """
+        page_size = page_size or Config.TELLER_PAGE_SIZE
+        from_id = None
+        
+        while True:
+            page = await self._request(
+                'GET',
+                f'/accounts/{account_id}/transactions',
+                params=_transaction_page_params(page_size, from_id, since)
+            )
+            if 'error' in page:
+                raise TellerError(page)
+            if not page:
+                return
+            
+            from_id = page[-1].get('id')
+            page, last_page = _trim_transaction_page(page, page_size, since)
+            if page:
+                yield page
+            if last_page:
+                return
 
-    def _request(self, method, path, data=None):
+    async def _request(self, method, path, data=None, params=None):
         url = self.base_url + path
-        headers = {}
         auth = (self.access_token, '') if self.access_token else None
         
-        response = requests.request(
-            method, 
-            url, 
-            json=data, 
-            cert=self.cert,
-            auth=auth,
-            headers=headers
-        )
+        try:
+            response = await get_async_teller_client().request(
+                method, url, json=data, params=params, auth=auth
+            )
+        except httpx.TimeoutException as e:
+            return {'error': f'Teller request timed out: {e}', 'status_code': 504}
+        except httpx.HTTPError as e:
+            return {'error': f'Teller request failed: {e}', 'status_code': 502}
         
         if response.status_code >= 400:
             return {'error': response.text, 'status_code': response.status_code}
         
         return response.json()
 
-# Google Sheets client
-class GoogleSheetsClient:
-    def __init__(self):
-        self.creds = None
-        self.sheet_id = Config.GOOGLE_SHEET_ID
-        
-        if Config.GOOGLE_CREDS_PATH:
-            self.creds = Credentials.from_service_account_file(
-                Config.GOOGLE_CREDS_PATH,
-                scopes=['https://www.googleapis.com/auth/spreadsheets']
-            )
-            self.service = build('sheets', 'v4', credentials=self.creds)
-            self.sheet = self.service.spreadsheets()
-            
-            # Check and set up the transactions sheet if needed
-            self._ensure_transactions_sheet()
-
-    def _ensure_transactions_sheet(self):
-        """Ensures the Transactions sheet exists with proper headers and returns the sheet ID"""
-        if not self.creds or not self.sheet_id:
-            return None
-            
-        try:
-            # Check if sheet exists
-            metadata = self.sheet.get(spreadsheetId=self.sheet_id).execute()
-            sheet_exists = False
-            sheet_id = None
-            
-            for sheet in metadata.get('sheets', []):
-                if sheet.get('properties', {}).get('title') == 'Transactions':
-                    sheet_exists = True
-                    sheet_id = sheet.get('properties', {}).get('sheetId')
-                    break
-            
-            # If sheet doesn't exist, create it
-            if not sheet_exists:
-                request = {
-                    'addSheet': {
-                        'properties': {
-                            'title': 'Transactions',
-                            'gridProperties': {
-                                'rowCount': 1000,
-                                'columnCount': 10
-                            }
-                        }
-                    }
-                }
-                
-                body = {'requests': [request]}
-                response = self.sheet.batchUpdate(spreadsheetId=self.sheet_id, body=body).execute()
-                
-                # Get the sheet ID from the response
-                sheet_id = response.get('replies', [{}])[0].get('addSheet', {}).get('properties', {}).get('sheetId')
-                print("Created 'Transactions' sheet")
-            
-            # Check if headers exist
-            result = self.sheet.values().get(
-                spreadsheetId=self.sheet_id,
-                range='Transactions!A1:I1'
-            ).execute()
-            
-            headers = result.get('values', [[]])[0] if 'values' in result else []
-            expected_headers = [
-                'Transaction ID', 'Account ID', 'Date', 'Account Name', 'Description', 
-                'Amount', 'Category', 'Notes', 'Timestamp'
-            ]
-            
-            # If no headers or incomplete headers, add them
-            if len(headers) < len(expected_headers):
-                body = {
-                    'values': [expected_headers]
-                }
-                
-                self.sheet.values().update(
-                    spreadsheetId=self.sheet_id,
-                    range='Transactions!A1:I1',
-                    valueInputOption='RAW',
-                    body=body
-                ).execute()
-                print("Added headers to Transactions sheet")
-            
-            return sheet_id
-                
-        except Exception as e:
-            print(f"Error setting up Google Sheet: {e}")
-            return None
+class CompiledRules:
+    """
+    A rule matcher and the category name of each of its rules, built together
+    so a categorization never mixes rules from before and after a change
+    """
+    __slots__ = ('matcher', 'pattern_names')
+    
+    def __init__(self, matcher, pattern_names):
+        self.matcher = matcher
+        self.pattern_names = pattern_names
 
-    def _get_existing_transactions(self):
-        """Retrieve all existing transaction IDs and their row numbers"""
-        if not self.creds or not self.sheet_id:
-            return {}
-            
-        try:
-            # Get all data from the sheet
-            result = self.sheet.values().get(
-                spreadsheetId=self.sheet_id,
-                range='Transactions!A:I'
-            ).execute()
-            
-            values = result.get('values', [])
-            if not values or len(values) <= 1:  # Only headers or empty
-                return {}
-                
-            # Create a map of transaction IDs to row numbers (0-based index)
-            # Skip the header row (index 0)
-            tx_map = {}
-            for i, row in enumerate(values[1:], 1):  # Start from row 1 (after header)
-                if row and len(row) > 0:
-                    tx_id = row[0]  # Transaction ID is in the first column
-                    tx_map[tx_id] = i
-                    
-            return tx_map
-                
-        except Exception as e:
-            print(f"Error retrieving existing transactions: {e}")
-            return {}
-
-    def append_transactions(self, transactions):
+# Category Manager
+class CategoryManager:
+    def __init__(self, db=None):
         """
-        Add transactions to the Google Sheet.
-        - Adds new transactions at the top of the sheet (after the header)
-        - Detects and updates existing transactions
-        - Skips unchanged transactions
+        Args:
+            db: StateStore to keep categories and mappings in instead of the
+                JSON files (optional)
         """
-        if not self.creds or not self.sheet_id:
-            return {'error': 'Google Sheets credentials or Sheet ID not configured'}
-        
-        # Ensure sheet is set up before proceeding and get the sheet ID
-        sheet_id = self._ensure_transactions_sheet()
-        if not sheet_id:
-            return {'error': 'Could not get or create Transactions sheet'}
-        
-        # Get existing transaction IDs and their row numbers
-        existing_transactions = self._get_existing_transactions()
-        
-        # Separate transactions into new and existing
-        new_transactions = []
-        updates = []
-        
-        for tx in transactions:
-            # Format the transaction data
-            tx_data = [
-                tx.id,
-                tx.account_id,
-                tx.date,
-                tx.account_name,
-                tx.description,
-                tx.amount,
-                tx.category or '',
-                tx.notes or '',
-                datetime.now().isoformat()
-            ]
+        self.categories_file = Config.CATEGORIES_FILE
+        self.mappings_file = Config.TRANSACTION_MAPPING_FILE
+        self._db = db
+        # Categorization also runs in worker threads (e.g. via asyncio.to_thread),
+        # so changes to the rules and the compiled rules are made under this lock
+        self._lock = threading.RLock()
+        self._revision = None  # Database revision of the rules held in memory
+        self._categories_store = None
+        self._mappings_store = None
+        if db is None:
+            # Changes are written atomically, at most SAVE_DELAY_SECONDS after the first one
+            self._categories_store = JsonFile(self.categories_file, lambda: self.categories, Config.SAVE_DELAY_SECONDS)
+            self._mappings_store = JsonFile(self.mappings_file, lambda: self.mappings, Config.SAVE_DELAY_SECONDS)
+        self._load()
+        self._matcher = None  # Compiled lazily, reset when mappings change
+        self._compiled = None  # CompiledRules, reset on any change
+        self._rules_version = None  # Fingerprint of categories and mappings, reset on any change
+        self._categorize_cached = functools.lru_cache(maxsize=Config.CATEGORY_CACHE_SIZE)(
+            self._categorize_description
+        )
+        self._index_categories()
+    
+    def _load(self, categories=True, mappings=True):
+        """Read categories and/or mappings from the database or the JSON files"""
+        if self._db is not None:
+            self._revision = self._db.revision('rules')
+            self.categories = self._db.load_categories()
+            self.mappings = self._db.load_mappings()
+            return
+        if categories:
+            self.categories = self._categories_store.load([])
+        if mappings:
+            self.mappings = self._mappings_store.load({})
+    
+    @contextmanager
+    def _saving(self, store):
+        """Context for a change: a database transaction, or a (delayed) save of the JSON file"""
+        with self._lock:
+            if self._db is None:
+                with store.update():
+                    yield
+                return
             
-            if tx.id in existing_transactions:
-                # Get current row data to compare
-                row_num = existing_transactions[tx.id]
-                row_range = f'Transactions!A{row_num+1}:I{row_num+1}'  # +1 because sheets are 1-indexed
-                
-                try:
-                    # Get the current row data
-                    current_data_result = self.sheet.values().get(
-                        spreadsheetId=self.sheet_id,
-                        range=row_range
-                    ).execute()
-                    
-                    current_data = current_data_result.get('values', [[]])[0]
-                    
-                    # Check if the transaction has changed (ignore timestamp)
-                    # Compare first 8 columns (everything except timestamp)
-                    changed = False
-                    for i in range(min(len(current_data), 8)):
-                        if i < len(tx_data) and str(current_data[i]) != str(tx_data[i]):
-                            changed = True
-                            break
-                    
-                    if changed:
-                        # Update the existing row
-                        updates.append({
-                            'range': row_range,
-                            'values': [tx_data]
-                        })
-                except Exception as e:
-                    print(f"Error checking existing transaction {tx.id}: {e}")
-                    # Add to new transactions as fallback
-                    new_transactions.append(tx_data)
-            else:
-                # New transaction
-                new_transactions.append(tx_data)
-        
-        results = {}
-        
-        # Process updates for existing transactions
-        if updates:
-            try:
-                update_body = {
-                    'valueInputOption': 'RAW',
-                    'data': updates
-                }
-                update_result = self.sheet.values().batchUpdate(
-                    spreadsheetId=self.sheet_id,
-                    body=update_body
-                ).execute()
-                results['updated'] = len(updates)
-            except Exception as e:
-                print(f"Error updating existing transactions: {e}")
-                results['update_error'] = str(e)
+            with self._db.transaction():
+                yield
+                revision = self._db.bump('rules', self._revision)
+            self._revision = revision
+    
+    def reload_if_changed(self):
+        """
+        Reload categories and mappings if another process (such as another
+        uvicorn worker) changed them. Cheap enough to call on every request.
         
-        # Insert new transactions at the top (after header row)
-        if new_transactions:
-            try:
-                # Insert rows after header
-                insert_body = {
-                    'requests': [{
-                        'insertRange': {
-                            'range': {
-                                'sheetId': sheet_id,  # Using the actual sheet ID
-                                'startRowIndex': 1,  # After header row
-                                'endRowIndex': 1 + len(new_transactions),
-                                'startColumnIndex': 0,
-                                'endColumnIndex': 9  # 9 columns
-                            },
-                            'shiftDimension': 'ROWS'
-                        }
-                    }]
-                }
-                
-                # First, insert the rows
-                self.sheet.batchUpdate(
-                    spreadsheetId=self.sheet_id,
-                    body=insert_body
-                ).execute()
-                
-                # Then, populate the inserted rows with data
-                populate_body = {
-                    'values': new_transactions
-                }
-                
-                insert_result = self.sheet.values().update(
-                    spreadsheetId=self.sheet_id,
-                    range='Transactions!A2',  # Start after header
-                    valueInputOption='RAW',
-                    body=populate_body
-                ).execute()
-                
-                results['inserted'] = len(new_transactions)
-            except Exception as e:
-                print(f"Error inserting new transactions: {e}")
-                results['insert_error'] = str(e)
+        Returns:
+            bool: True if anything was reloaded
+        """
+        if self._db is not None:
+            categories = mappings = self._db.revision('rules') != self._revision
+        else:
+            categories = self._categories_store.changed_on_disk()
+            mappings = self._mappings_store.changed_on_disk()
+        if not categories and not mappings:
+            return False
         
-        return results
-
-# Category Manager
-class CategoryManager:
-    def __init__(self):
-        self.categories_file = Config.CATEGORIES_FILE
-        self.mappings_file = Config.TRANSACTION_MAPPING_FILE
-        self.categories = self._load_categories()
-        self.mappings = self._load_mappings()
+        with self._lock:
+            self._load(categories, mappings)
+            self._index_categories()
+            self._invalidate(mappings=True)
+        return True
     
-    def _load_categories(self):
-        try:
-            if os.path.exists(self.categories_file):
-                with open(self.categories_file, 'r') as f:
-                    return json.load(f)
-            return []
-        except Exception as e:
-            print(f"Error loading categories: {e}")
-            return []
+    def flush(self):
+        """Write any category or mapping changes that are waiting for the save delay"""
+        if self._db is not None:
+            return True
+        categories_saved = self._categories_store.flush()
+        mappings_saved = self._mappings_store.flush()
+        return categories_saved and mappings_saved
     
-    def _load_mappings(self):
-        try:
-            if os.path.exists(self.mappings_file):
-                with open(self.mappings_file, 'r') as f:
-                    return json.load(f)
-            return {}
-        except Exception as e:
-            print(f"Error loading mappings: {e}")
-            return {}
-    
-    def _save_categories(self):
-        try:
-            with open(self.categories_file, 'w') as f:
-                json.dump(self.categories, f, indent=2)
-        except Exception as e:
-            print(f"Error saving categories: {e}")
+    def _index_categories(self):
+        """Build the id and name lookup tables from the categories list"""
+        self._categories_by_id = {}
+        self._categories_by_name = {}
+        for cat in self.categories:
+            self._add_to_indexes(cat)
+        self._invalidate()
     
-    def _save_mappings(self):
-        try:
-            with open(self.mappings_file, 'w') as f:
-                json.dump(self.mappings, f, indent=2)
-        except Exception as e:
-            print(f"Error saving mappings: {e}")
+    def _add_to_indexes(self, cat):
+        self._categories_by_id.setdefault(cat.get('id'), cat)
+        self._categories_by_name.setdefault(cat.get('name'), []).append(cat)
+    
+    def _remove_name_index(self, cat):
+        same_name = self._categories_by_name.get(cat.get('name'), [])
+        for i, existing in enumerate(same_name):
+            if existing is cat:
+                del same_name[i]
+                break
+        if not same_name:
+            self._categories_by_name.pop(cat.get('name'), None)
     
     def get_categories(self):
         return self.categories
     
     def add_category(self, category_data):
+        with self._saving(self._categories_store):
+            success = self._add_category(category_data)
+        if success:
+            self._invalidate()
+        return success
+    
+    def _add_category(self, category_data):
         # Check if name already exists
-        for existing in self.categories:
-            if existing.get('name') == category_data.name:
-                return False
+        if category_data.name in self._categories_by_name:
+            return False
         
         # Add unique ID if not provided
         category_dict = category_data.dict()
@@ -553,64 +454,311 @@ class CategoryManager:
             category_dict['id'] = str(uuid.uuid4())
         
         self.categories.append(category_dict)
-        self._save_categories()
+        self._add_to_indexes(category_dict)
+        if self._db is not None:
+            self._db.put_category(category_dict)
         return True
     
     def update_category(self, category_id, updated_category):
-        for i, cat in enumerate(self.categories):
-            if cat.get('id') == category_id:
-                # Update only provided fields while preserving the ID
-                update_dict = updated_category.dict(exclude_unset=True)
-                self.categories[i].update(update_dict)
-                self.categories[i]['id'] = category_id  # Ensure ID doesn't change
-                self._save_categories()
-                return True
-        return False
+        with self._saving(self._categories_store):
+            success = self._update_category(category_id, updated_category)
+        if success:
+            self._invalidate()
+        return success
+    
+    def _update_category(self, category_id, updated_category):
+        cat = self._categories_by_id.get(category_id)
+        if cat is None:
+            return False
+        
+        # Update only provided fields while preserving the ID
+        update_dict = updated_category.dict(exclude_unset=True)
+        self._remove_name_index(cat)
+        cat.update(update_dict)
+        cat['id'] = category_id  # Ensure ID doesn't change
+        self._categories_by_name.setdefault(cat.get('name'), []).append(cat)
+        if self._db is not None:
+            self._db.put_category(cat)
+        return True
     
     def delete_category(self, category_id):
-        for i, cat in enumerate(self.categories):
-            if cat.get('id') == category_id:
-                del self.categories[i]
-                self._save_categories()
-                return True
-        return False
+        with self._saving(self._categories_store):
+            success = self._delete_category(category_id)
+        if success:
+            self._invalidate()
+        return success
+    
+    def _delete_category(self, category_id):
+        cat = self._categories_by_id.pop(category_id, None)
+        if cat is None:
+            return False
+        
+        self._remove_name_index(cat)
+        self.categories.remove(cat)
+        if self._db is not None:
+            self._db.delete_category(category_id)
+        return True
+    
+    def apply_category_changes(self, add=(), update=None, delete=()):
+        """
+        Add, update and delete many categories with a single save
+        
+        Args:
+            add: Category models to add; names that already exist are skipped
+            update: Map of category ID to CategoryUpdate
+            delete: Category IDs to delete
+        
+        Returns:
+            Dict: Names that weren't added because they exist, and IDs that
+            weren't updated or deleted because they don't
+        """
+        result = {'existing': [], 'not_found': []}
+        with self._saving(self._categories_store):
+            for category in add:
+                if not self._add_category(category):
+                    result['existing'].append(category.name)
+            for category_id, category in (update or {}).items():
+                if not self._update_category(category_id, category):
+                    result['not_found'].append(category_id)
+            for category_id in delete:
+                if not self._delete_category(category_id):
+                    result['not_found'].append(category_id)
+        self._invalidate()
+        return result
     
     def get_mappings(self):
         return self.mappings
     
-    def add_mapping(self, pattern, category_id):
-        self.mappings[pattern] = category_id
-        self._save_mappings()
+    def add_mapping(self, pattern, category_id, rule_type='substring', min_amount=None, max_amount=None):
+        with self._saving(self._mappings_store):
+            self._set_mapping(pattern, category_id, rule_type, min_amount, max_amount)
+        self._invalidate(mappings=True)
         return True
     
+    def _set_mapping(self, pattern, category_id, rule_type='substring', min_amount=None, max_amount=None):
+        if rule_type == 'substring' and min_amount is None and max_amount is None:
+            # Plain substring rules keep the original pattern -> category ID format
+            self.mappings[pattern] = category_id
+        else:
+            rule = {'category_id': category_id, 'type': rule_type}
+            if min_amount is not None:
+                rule['min_amount'] = min_amount
+            if max_amount is not None:
+                rule['max_amount'] = max_amount
+            self.mappings[pattern] = rule
+        if self._db is not None:
+            self._db.put_mapping(pattern, self.mappings[pattern])
+    
     def delete_mapping(self, pattern):
         if pattern in self.mappings:
-            del self.mappings[pattern]
-            self._save_mappings()
+            with self._saving(self._mappings_store):
+                del self.mappings[pattern]
+                if self._db is not None:
+                    self._db.delete_mapping(pattern)
+            self._invalidate(mappings=True)
             return True
         return False
     
+    def apply_mapping_changes(self, upsert=(), delete=()):
+        """
+        Add or replace many mappings and delete others with a single save
+        and a single recompile of the rules
+        
+        Args:
+            upsert: Mapping models to add or replace
+            delete: Patterns to delete (applied after upsert)
+        
+        Returns:
+            List[str]: Patterns in delete that didn't exist
+        """
+        not_found = []
+        with self._saving(self._mappings_store):
+            for mapping in upsert:
+                self._set_mapping(mapping.pattern, mapping.category_id, mapping.type,
+                                  mapping.min_amount, mapping.max_amount)
+            for pattern in delete:
+                if self.mappings.pop(pattern, None) is None:
+                    not_found.append(pattern)
+                elif self._db is not None:
+                    self._db.delete_mapping(pattern)
+        self._invalidate(mappings=True)
+        return not_found
+    
+    def _invalidate(self, mappings=False):
+        """Drop compiled rules and cached results after categories or mappings change"""
+        with self._lock:
+            if mappings:
+                self._matcher = None
+            self._compiled = None
+            self._rules_version = None
+            # A lookup still running in another thread may add a result computed
+            # with the old rules, but it is keyed by the old CompiledRules and never read
+            self._categorize_cached.cache_clear()
+    
+    def _get_rules(self):
+        """Expand mappings into rule dicts, in priority order"""
+        rules = []
+        for pattern, value in self.mappings.items():
+            if isinstance(value, dict):
+                rule = dict(value, pattern=pattern)
+            else:
+                rule = {'pattern': pattern, 'category_id': value, 'type': 'substring'}
+            rules.append(rule)
+        return rules
+    
+    def _get_compiled(self):
+        """
+        Return the compiled rules, rebuilding them if categories or mappings
+        changed. The rule matcher is only rebuilt if mappings changed.
+        """
+        with self._lock:
+            if self._compiled is None:
+                if self._matcher is None:
+                    self._matcher = RuleMatcher(self._get_rules())
+                # Category name for each matcher rule (None if the category is missing)
+                names = []
+                for rule in self._matcher.rules:
+                    cat = self._categories_by_id.get(rule.get('category_id'))
+                    names.append(cat.get('name') if cat is not None else None)
+                self._compiled = CompiledRules(self._matcher, names)
+            return self._compiled
+    
     def categorize_transaction(self, transaction):
-        """Auto-categorize a transaction based on mappings"""
-        description = transaction.description.lower()
+        """
+        Auto-categorize a transaction based on mappings.
         
-        # Check for direct matches in mappings
-        for pattern, category_id in self.mappings.items():
-            if pattern.lower() in description:
-                # Find category name
-                for cat in self.categories:
-                    if cat.get('id') == category_id:
-                        return cat.get('name')
+        When several rules match, the one defined first in the mappings
+        file wins, so "uber eats" listed before "uber" takes priority for
+        "UBER EATS ORDER". Rules pointing at a missing category are skipped.
+        """
+        return self._categorize(transaction.description, transaction.amount_cents)
+    
+    def categorize_many(self, transactions):
+        """
+        Categorize a batch of transactions in one pass.
+        
+        Accepts description strings, raw transaction dicts (as returned by
+        Teller, optionally with amount_cents) or Transaction models and
+        returns the category names in the same order. The rules are fetched
+        once for the whole batch and repeated transactions are only looked up once.
+        """
+        compiled = self._get_compiled()
+        seen = {}
+        results = []
+        
+        for tx in transactions:
+            if isinstance(tx, str):
+                description, amount_cents = tx, None
+            elif isinstance(tx, dict):
+                description = tx.get('description') or ''
+                amount_cents = tx['amount_cents'] if 'amount_cents' in tx else parse_cents(tx.get('amount'))
+            else:
+                description, amount_cents = tx.description, tx.amount_cents
+            key = self._cache_key(compiled, description, amount_cents)
+            if key not in seen:
+                seen[key] = self._categorize_cached(compiled, *key)
+            results.append(seen[key])
+        
+        return results
+    
+    def rules_version(self):
+        """
+        Fingerprint of the current categories and mappings, used to tell when
+        stored categories are out of date
+        """
+        with self._lock:
+            if self._rules_version is None:
+                state = json.dumps([self.categories, self.mappings], sort_keys=True)
+                self._rules_version = hashlib.sha1(state.encode()).hexdigest()
+            return self._rules_version
+    
+    def cache_info(self):
+        """Hit/miss statistics for the categorization cache"""
+        info = self._categorize_cached.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "max_size": info.maxsize,
+            "hit_rate": info.hits / lookups if lookups else 0.0
+        }
+    
+    def _categorize(self, description, amount_cents=None):
+        """Look up a description in the cache, keyed by its normalized form when the rules allow it"""
+        compiled = self._get_compiled()
+        return self._categorize_cached(compiled, *self._cache_key(compiled, description, amount_cents))
+    
+    @staticmethod
+    def _cache_key(compiled, description, amount_cents):
+        """The (description, amount_cents) the rules can tell apart, used as the cache key"""
+        if compiled.matcher.normalization_safe:
+            description = normalize_description(description)
+        amount_cents = amount_cents if compiled.matcher.has_amount_rules else None
+        return description, amount_cents
+    
+    def _categorize_description(self, compiled, description, amount_cents=None):
+        pattern_names = compiled.pattern_names
+        
+        for index in compiled.matcher.find_all(description, amount_cents):
+            if pattern_names[index] is not None:
+                return pattern_names[index]
         
         # Default to "Uncategorized" if no match
         return "Uncategorized"
 
 
 # Initialize clients
-teller_client = TellerClient()
-sheets_client = GoogleSheetsClient()
-category_manager = CategoryManager()
-token_manager = TellerTokenManager(Config.CREDS_DIR)
+state_store = None
+if Config.STATE_BACKEND == 'sqlite':
+    state_store = StateStore(Config.STATE_DB)
+    state_store.migrate_from_json(
+        Config.CATEGORIES_FILE,
+        Config.TRANSACTION_MAPPING_FILE,
+        os.path.join(Config.CREDS_DIR, 'teller_tokens.json')
+    )
+sheets_client = GoogleSheetsClient(
+    backend=LocalSheetBackend(Config.SHEETS_LOCAL_PATH) if Config.SHEETS_BACKEND == 'local' else None,
+    state=state_store
+)
+category_manager = CategoryManager(db=state_store)
+token_manager = TellerTokenManager(Config.CREDS_DIR, save_delay=Config.SAVE_DELAY_SECONDS, db=state_store)
+transaction_store = TransactionStore(Config.TRANSACTIONS_DB)
+export_queue = ExportQueue(sheets_client.append_transactions)
+
+async def sync_account_transactions(client, account_id, force=False):
+    """
+    Bring the local transaction store up to date for one account.
+    
+    Skipped if the account was synced less than SYNC_INTERVAL_SECONDS ago,
+    unless force is set. After the first full download, Teller is only asked
+    for transactions since the newest stored date minus SYNC_LOOKBACK_DAYS so
+    pending transactions that have since posted get replaced.
+    
+    Returns the Teller error dict if the sync failed, otherwise None.
+    """
+    state = transaction_store.get_sync_state(account_id)
+    if state and not force:
+        age = datetime.now() - datetime.fromisoformat(state['last_synced_at'])
+        if age.total_seconds() < Config.SYNC_INTERVAL_SECONDS:
+            return None
+    
+    start_date = None
+    if state and state.get('latest_date'):
+        latest = date.fromisoformat(state['latest_date'])
+        start_date = (latest - timedelta(days=Config.SYNC_LOOKBACK_DAYS)).isoformat()
+    
+    # Store each page as it arrives so memory doesn't grow with history length
+    seen_ids = set()
+    try:
+        async for page in client.iter_transactions(account_id, since=start_date):
+            await asyncio.to_thread(transaction_store.upsert_transactions, account_id, page)
+            seen_ids.update(tx.get('id') for tx in page)
+    except TellerError as e:
+        return e.error
+    
+    await asyncio.to_thread(transaction_store.finish_sync, account_id, seen_ids, since_date=start_date)
+    return None
 
 # Dependency to get Teller token from header or parameter
 async def get_teller_token(
@@ -633,68 +781,435 @@ async def get_teller_token(
         detail="Valid Teller token required. Provide X-Teller-Token header or institution parameter."
     )
 
+@app.middleware("http")
+async def reload_shared_state(request: Request, call_next):
+    """Pick up categories, mappings and tokens changed by other worker processes"""
+    category_manager.reload_if_changed()
+    token_manager.reload_if_changed()
+    return await call_next(request)
+
+json_state_locks = []
+
+@app.on_event("startup")
+async def lock_json_state():
+    """
+    Each process keeps its own copy of the JSON files and would overwrite the
+    others' changes when saving, so only one server process may use them at a
+    time. Taken at startup rather than import, so importing the module twice
+    (as `python app.py` does) or without serving doesn't count.
+    """
+    if state_store is not None:
+        return
+    for path in (Config.CATEGORIES_FILE, Config.TRANSACTION_MAPPING_FILE,
+                 os.path.join(Config.CREDS_DIR, 'teller_tokens.json')):
+        lock = lock_for_process(path)
+        if lock is None:
+            release_json_state()
+            raise RuntimeError(
+                f"{path} is already in use by another process. "
+                "Set STATE_BACKEND=sqlite to run several workers."
+            )
+        json_state_locks.append(lock)
+
+@app.on_event("shutdown")
+async def close_teller_clients():
+    global _async_teller_client
+    if _async_teller_client is not None:
+        await _async_teller_client.aclose()
+        _async_teller_client = None
+
+@app.on_event("shutdown")
+async def finish_exports():
+    await asyncio.to_thread(export_queue.shutdown, 30)
+
+@app.on_event("shutdown")
+async def close_transaction_store():
+    transaction_store.close()
+
+@app.on_event("shutdown")
+async def flush_saved_state():
+    category_manager.flush()
+    token_manager.flush()
+    if state_store is not None:
+        state_store.close()
+    release_json_state()
+
+def release_json_state():
+    while json_state_locks:
+        json_state_locks.pop().close()
+
+_categorize_lock = threading.Lock()
+
+def categorize_stored_transactions():
+    """
+    Categorize newly synced transactions, or all of them if the rules changed.
+    This can take seconds after a rule change, so routes run it in a worker
+    thread rather than on the event loop.
+    """
+    # One run at a time: a caller that waited finds the work already done
+    with _categorize_lock:
+        return transaction_store.categorize(category_manager.categorize_many, category_manager.rules_version())
+
+async def sync_all_accounts(refresh=False):
+    """
+    Sync every account of every connected institution into the local store.
+    Accounts are synced concurrently, with at most TELLER_FANOUT_CONCURRENCY
+    Teller calls at a time.
+    
+    Returns the accounts (each tagged with its institution) and a list of
+    per-institution or per-account errors.
+    """
+    semaphore = asyncio.Semaphore(Config.TELLER_FANOUT_CONCURRENCY)
+    errors = []
+    
+    async def limited(call):
+        async with semaphore:
+            return await call
+    
+    async def load_institution(token_info):
+        institution = {
+            "name": token_info.get("institution_name"),
+            "id": token_info.get("institution_id")
+        }
+        client = AsyncTellerClient(token_info.get("access_token"))
+        
+        accounts = await limited(client.list_accounts(refresh=refresh))
+        if 'error' in accounts:
+            errors.append({"institution": institution["name"], "detail": accounts['error']})
+            return []
+        
+        for account in accounts:
+            account['institution'] = institution
+        
+        results = await asyncio.gather(
+            *(limited(sync_account_transactions(client, account['id'], force=refresh)) for account in accounts)
+        )
+        
+        for account, error in zip(accounts, results):
+            if error:
+                errors.append({
+                    "institution": institution["name"],
+                    "account_id": account['id'],
+                    "detail": error['error']
+                })
+        
+        return accounts
+    
+    loaded = await asyncio.gather(
+        *(load_institution(token_info) for token_info in token_manager.get_all_tokens())
+    )
+    
+    accounts = [account for institution_accounts in loaded for account in institution_accounts]
+    await asyncio.to_thread(categorize_stored_transactions)
+    return accounts, errors
+
+_analytics_columns = None
+_analytics_revision = None
+_analytics_lock = threading.Lock()
+
+def get_analytics_columns():
+    """
+    Columnar copy of the transaction store, rebuilt only after the store
+    changes (including changes made by other worker processes)
+    """
+    global _analytics_columns, _analytics_revision
+    with _analytics_lock:
+        categorize_stored_transactions()
+        revision = transaction_store.revision
+        if _analytics_columns is None or _analytics_revision != revision:
+            _analytics_columns = TransactionColumns.from_store(transaction_store)
+            _analytics_revision = revision
+        return _analytics_columns
+
+def add_categories(transactions):
+    """Fill in the category of raw Teller transactions that don't have one yet"""
+    uncategorized = [tx for tx in transactions if 'category' not in tx]
+    for tx, category in zip(uncategorized, category_manager.categorize_many(uncategorized)):
+        tx['category'] = category
+    return transactions
+
+def read_stored_transactions(account_ids):
+    """
+    Stored transactions for the accounts, categorized. Takes seconds for long
+    histories, so routes run it in a worker thread.
+    """
+    return add_categories(transaction_store.get_transactions(account_ids))
+
+async def stream_stored_transactions(account_ids, header=None):
+    """
+    Yield stored transactions as newline-delimited JSON, categorizing each
+    batch as it is read so memory and time-to-first-byte stay flat.
+    
+    Each batch is read and encoded in a worker thread; the store opens a
+    fresh connection per batch, so it doesn't matter which thread that is.
+    """
+    if header is not None:
+        yield json.dumps(header) + '\n'
+    
+    batches = transaction_store.iter_transactions(account_ids)
+    
+    def next_chunk():
+        batch = next(batches, None)
+        if batch is None:
+            return None
+        return ''.join(json.dumps(tx) + '\n' for tx in add_categories(batch))
+    
+    while True:
+        chunk = await asyncio.to_thread(next_chunk)
+        if chunk is None:
+            return
+        yield chunk
+
 # Routes
 @app.get("/api/accounts")
 async def list_accounts(
     token: str = Depends(get_teller_token),
-    institution: Optional[str] = None
+    institution: Optional[str] = None,
+    refresh: bool = False
 ):
-    client = TellerClient(token)
-    accounts = client.list_accounts()
+    client = AsyncTellerClient(token)
+    accounts = await client.list_accounts(refresh=refresh)
     
     if 'error' in accounts:
         raise HTTPException(status_code=accounts.get('status_code', 400), detail=accounts['error'])
     
     return accounts
 
+@app.get("/api/accounts/{account_id}/details")
+async def get_account_details(
+    account_id: str,
+    token: str = Depends(get_teller_token),
+    institution: Optional[str] = None,
+    refresh: bool = False
+):
+    client = AsyncTellerClient(token)
+    details = await client.get_account_details(account_id, refresh=refresh)
+    
+    if 'error' in details:
+        raise HTTPException(status_code=details.get('status_code', 400), detail=details['error'])
+    
+    return details
+
+@app.get("/api/accounts/{account_id}/balances")
+async def get_account_balances(
+    account_id: str,
+    token: str = Depends(get_teller_token),
+    institution: Optional[str] = None,
+    refresh: bool = False
+):
+    client = AsyncTellerClient(token)
+    balances = await client.get_account_balances(account_id, refresh=refresh)
+    
+    if 'error' in balances:
+        raise HTTPException(status_code=balances.get('status_code', 400), detail=balances['error'])
+    
+    return balances
+
 @app.get("/api/accounts/{account_id}/transactions")
 async def list_transactions(
     account_id: str, 
     token: str = Depends(get_teller_token),
-    institution: Optional[str] = None
+    institution: Optional[str] = None,
+    refresh: bool = False,
+    stream: bool = False
 ):
-    client = TellerClient(token)
-    transactions = client.list_transactions(account_id)
+    """
+    List an account's transactions from the local store, syncing with Teller first.
+    With stream=true the response is newline-delimited JSON, one transaction per line.
+    
+    The store is single-user, like /api/transactions and /api/summary: the token
+    is only used for the sync, not to limit which stored accounts can be read.
+    """
+    client = AsyncTellerClient(token)
+    error = await sync_account_transactions(client, account_id, force=refresh)
     
-    if 'error' in transactions:
-        raise HTTPException(status_code=transactions.get('status_code', 400), detail=transactions['error'])
+    # Fall back to previously synced data if Teller is unreachable or failing,
+    # but not when it rejected the request
+    if error and (error.get('status_code', 400) < 500 or transaction_store.get_sync_state(account_id) is None):
+        raise HTTPException(status_code=error.get('status_code', 400), detail=error['error'])
+    
+    await asyncio.to_thread(categorize_stored_transactions)
+    
+    if stream:
+        return StreamingResponse(
+            stream_stored_transactions([account_id]),
+            media_type="application/x-ndjson"
+        )
     
     # Add category field to each transaction if missing
-    for tx in transactions:
-        if 'category' not in tx:
-            # Convert dict to Transaction model and back for categorization
-            tx_model = Transaction(
-                id=tx.get('id', ''),
-                account_id=tx.get('account_id', ''),
-                date=tx.get('date', ''),
-                account_name=tx.get('account_name', ''),
-                description=tx.get('description', ''),
-                amount=tx.get('amount', '')
-            )
-            tx['category'] = category_manager.categorize_transaction(tx_model)
+    return await asyncio.to_thread(read_stored_transactions, [account_id])
+
+@app.get("/api/transactions/all")
+async def list_all_transactions(refresh: bool = False, stream: bool = False):
+    """
+    Fetch transactions for every account of every connected institution.
+    Accounts are synced into the local store concurrently (see
+    sync_all_accounts), then the stored transactions are returned newest first.
     
-    return transactions
+    With stream=true the response is newline-delimited JSON: the first line
+    holds the accounts and errors, every following line is a transaction.
+    """
+    accounts, errors = await sync_all_accounts(refresh)
+    account_ids = [account['id'] for account in accounts]
+    
+    if stream:
+        return StreamingResponse(
+            stream_stored_transactions(account_ids, header={"accounts": accounts, "errors": errors}),
+            media_type="application/x-ndjson"
+        )
+    
+    transactions = await asyncio.to_thread(read_stored_transactions, account_ids)
+    
+    return {"accounts": accounts, "transactions": transactions, "errors": errors}
+
+@app.post("/api/transactions/sync")
+async def sync_transactions(refresh: bool = False):
+    """Sync every connected account into the local store without returning transactions"""
+    accounts, errors = await sync_all_accounts(refresh)
+    return {"accounts": accounts, "errors": errors}
+
+@app.get("/api/transactions")
+async def query_transactions(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    account_id: Optional[List[str]] = Query(None),
+    type: str = 'all',
+    search: Optional[str] = None,
+    sort: str = 'date_desc',
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500)
+):
+    """
+    Filter, search and page through synced transactions without contacting Teller.
+    
+    type is one of all, income, expense or uncategorized; sort is one of
+    date_desc, date_asc, amount_desc or amount_asc. Pass the returned
+    next_cursor back as cursor to get the following page.
+    """
+    await asyncio.to_thread(categorize_stored_transactions)
+    
+    try:
+        transactions, next_cursor = transaction_store.query_transactions(
+            start_date=start_date,
+            end_date=end_date,
+            account_ids=account_id,
+            transaction_type=type,
+            search=search,
+            sort=sort,
+            cursor=cursor,
+            limit=limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {"transactions": transactions, "next_cursor": next_cursor}
+
+@app.get("/api/summary")
+async def get_summary(
+    year: int = Query(..., ge=1900, le=9999),
+    month: int = Query(..., ge=1, le=12),
+    account_id: Optional[List[str]] = Query(None)
+):
+    """
+    Income, expenses and spending per category for one month (1-12), plus
+    every month that has transactions. Served from monthly rollups that the
+    transaction store keeps up to date as transactions are synced and
+    categorized.
+    """
+    await asyncio.to_thread(categorize_stored_transactions)
+    summary = transaction_store.get_monthly_summary(year, month, account_id)
+    
+    colors = {}
+    for cat in category_manager.get_categories():
+        colors.setdefault(cat.get('name'), cat.get('color'))
+    for item in summary['spending_by_category']:
+        item['color'] = colors.get(item['category']) or '#9CA3AF'
+    
+    return {"year": year, "month": month, **summary}
+
+@app.get("/api/analytics/trends")
+async def get_spending_trends(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    window: int = Query(3, ge=1, le=24),
+    account_id: Optional[List[str]] = Query(None)
+):
+    """
+    Monthly spending per category with a trailing average over window months
+    and the change from the same month a year earlier. start and end are
+    YYYY-MM; by default the 24 months up to the latest transaction are shown.
+    """
+    try:
+        start_month = parse_month(start) if start else None
+        end_month = parse_month(end) if end else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    columns = await asyncio.to_thread(get_analytics_columns)
+    
+    if end_month is None:
+        data_range = columns.month_range()
+        end_month = data_range[1] if data_range else parse_month(date.today().strftime("%Y-%m"))
+    if start_month is None:
+        start_month = end_month - 23
+    if start_month > end_month:
+        raise HTTPException(
+            status_code=400,
+            detail=f"start ({format_month(start_month)}) is after end ({format_month(end_month)})"
+        )
+    if end_month - start_month >= 1200:
+        raise HTTPException(status_code=400, detail="Range cannot be longer than 100 years")
+    
+    return await asyncio.to_thread(spending_trends, columns, start_month, end_month, window, account_id)
 
 @app.post("/api/transactions/categorize")
 async def categorize_transactions(data: TransactionBatch):
-    categorized = []
+    # If category not provided, auto-categorize
+    uncategorized = [tx for tx in data.transactions if not tx.category]
+    categories = category_manager.categorize_many(uncategorized)
     
-    for tx in data.transactions:
-        # If category not provided, auto-categorize
-        if not tx.category:
-            tx.category = category_manager.categorize_transaction(tx)
-        categorized.append(tx)
+    for tx, category in zip(uncategorized, categories):
+        tx.category = category
     
-    return categorized
+    return data.transactions
 
-@app.post("/api/transactions/export")
+@app.put("/api/transactions/{account_id}/{transaction_id}/category")
+async def set_transaction_category(account_id: str, transaction_id: str, data: TransactionCategory):
+    """
+    Set a synced transaction's category by hand. The category is kept through
+    later syncs and rule changes, so it shows up in queries and exports.
+    """
+    if not transaction_store.set_category(account_id, transaction_id, data.category):
+        raise HTTPException(status_code=404, detail=f"Transaction not found: {transaction_id}")
+    return {"success": True}
+
+@app.get("/api/transactions/categorize/stats")
+async def categorize_cache_stats():
+    return category_manager.cache_info()
+
+@app.post("/api/transactions/export", status_code=202)
 async def export_transactions(data: TransactionBatch):
-    result = sheets_client.append_transactions(data.transactions)
-    
-    if 'error' in result:
-        raise HTTPException(status_code=400, detail=result['error'])
+    """
+    Queue transactions for export to Google Sheets and return the job to poll.
+    Exports submitted while an earlier one is still waiting are merged into it.
+    """
+    if not sheets_client.configured:
+        raise HTTPException(status_code=400, detail='Google Sheets credentials or Sheet ID not configured')
     
-    return result
+    return export_queue.submit(data.transactions)
+
+@app.get("/api/transactions/export/{job_id}")
+async def get_export_job(job_id: str):
+    job = export_queue.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Export job {job_id} not found")
+    return job
+
+@app.post("/api/transactions/export/refresh")
+async def refresh_export_cache():
+    """Re-read the sheet on the next export, e.g. after editing it by hand"""
+    sheets_client.refresh()
+    return {"message": "Sheet cache cleared"}
 
 @app.get("/api/categories")
 async def get_categories():
@@ -727,13 +1242,25 @@ async def delete_category(category_id: str):
     
     return {"success": True, "categories": category_manager.get_categories()}
 
+@app.post("/api/categories/bulk")
+async def apply_category_changes(changes: CategoryChanges):
+    """Add, update and delete many categories with a single save"""
+    result = category_manager.apply_category_changes(changes.add, changes.update, changes.delete)
+    return {"success": True, **result, "categories": category_manager.get_categories()}
+
 @app.get("/api/mappings")
 async def get_mappings():
     return category_manager.get_mappings()
 
 @app.post("/api/mappings")
 async def add_mapping(mapping: Mapping):
-    success = category_manager.add_mapping(mapping.pattern, mapping.category_id)
+    success = category_manager.add_mapping(
+        mapping.pattern,
+        mapping.category_id,
+        mapping.type,
+        mapping.min_amount,
+        mapping.max_amount
+    )
     
     if not success:
         raise HTTPException(status_code=400, detail="Failed to add mapping")
@@ -749,6 +1276,12 @@ async def delete_mapping(pattern: str):
     
     return {"success": True, "mappings": category_manager.get_mappings()}
 
+@app.post("/api/mappings/bulk")
+async def apply_mapping_changes(changes: MappingChanges):
+    """Add, replace and delete many mappings with a single save"""
+    not_found = category_manager.apply_mapping_changes(changes.upsert, changes.delete)
+    return {"success": True, "not_found": not_found, "mappings": category_manager.get_mappings()}
+
 # Teller Connect integration endpoints
 @app.post("/api/teller/store-token")
 async def store_teller_token(enrollment: TellerEnrollment):
@@ -782,19 +1315,57 @@ async def list_teller_tokens():
     return sanitized_tokens
 
 @app.delete("/api/teller/tokens/{institution_name}")
-async def delete_teller_token(institution_name: str):
-    """Delete a Teller token for a specific institution"""
-    token = token_manager.get_token_by_institution(institution_name)
+async def delete_teller_token(
+    institution_name: str,
+    enrollment_id: Optional[str] = None,
+    all_enrollments: bool = False
+):
+    """
+    Delete a Teller token for a specific institution: its default (most
+    recently connected) enrollment, the one for enrollment_id, or every
+    enrollment with all_enrollments=true
+    """
+    if all_enrollments and enrollment_id is not None:
+        raise HTTPException(status_code=400, detail="Pass either enrollment_id or all_enrollments, not both")
+    
+    if all_enrollments:
+        deleted = token_manager.delete_institution_tokens(institution_name)
+    else:
+        token = token_manager.delete_institution_token(institution_name, enrollment_id)
+        deleted = [token] if token is not None else []
     
-    if not token:
+    if not deleted:
         raise HTTPException(status_code=404, detail=f"No token found for institution: {institution_name}")
     
-    success = token_manager.delete_token(token)
+    for token in deleted:
+        teller_cache.invalidate(token["access_token"])
     
-    if not success:
-        raise HTTPException(status_code=400, detail="Failed to delete token")
+    return {"success": True, "deleted": len(deleted), "message": f"Token for {institution_name} deleted successfully"}
+
+@app.post("/api/teller/cache/invalidate")
+async def invalidate_teller_cache(
+    x_teller_token: Optional[str] = Header(None),
+    institution: Optional[str] = None
+):
+    """
+    Drop cached Teller accounts, details and balances: for the token in the
+    X-Teller-Token header, for every enrollment of an institution, or all of them
+    """
+    if x_teller_token:
+        tokens = [x_teller_token]
+    elif institution:
+        tokens = [token["access_token"] for token in token_manager.get_tokens_by_institution(institution)]
+        if not tokens:
+            raise HTTPException(status_code=404, detail=f"No token found for institution: {institution}")
+    else:
+        return {"invalidated": teller_cache.invalidate()}
     
-    return {"success": True, "message": f"Token for {institution_name} deleted successfully"}
+    return {"invalidated": sum(teller_cache.invalidate(token) for token in tokens)}
+
+@app.get("/api/teller/cache/stats")
+async def teller_cache_stats():
+    """Hit rates of the Teller response cache"""
+    return teller_cache.stats()
 
 # Routes for HTML pages
 @app.get("/", response_class=HTMLResponse)
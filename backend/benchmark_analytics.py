@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from collections import defaultdict
+from datetime import date, timedelta
+
+from analytics import TransactionColumns, month_index, spending_trends
+from transaction_store import TransactionStore
+
+CATEGORIES = [
+    "Food & Dining", "Groceries", "Shopping", "Entertainment", "Transportation",
+    "Travel", "Utilities", "Housing", "Health & Fitness", "Income", "Uncategorized",
+]
+
+
+def generate_rows(count, years, accounts=4, seed=42):
+    """Synthetic (date, amount_cents, category, account_id) tuples spread over the last few years"""
+    rng = random.Random(seed)
+    end = date.today()
+    days = years * 365
+    rows = []
+    for _ in range(count):
+        day = end - timedelta(days=rng.randrange(days))
+        category = rng.choice(CATEGORIES)
+        cents = rng.randint(100, 500000) if category == "Income" else -rng.randint(50, 30000)
+        rows.append((day.isoformat(), cents, category, f"acc_{rng.randrange(accounts)}"))
+    return rows
+
+
+def python_trends(rows, start_month, end_month, window=3):
+    """Reference implementation: one Python loop over transaction tuples"""
+    spending = defaultdict(int)
+    for tx_date, cents, category, _ in rows:
+        month = month_index(int(tx_date[:4]), int(tx_date[5:7]))
+        if cents < 0 and start_month - 12 <= month <= end_month:
+            spending[(month, category)] += -cents
+
+    result = {}
+    for category in {key[1] for key in spending}:
+        series = []
+        for month in range(start_month, end_month + 1):
+            current = spending[(month, category)]
+            trailing = [spending[(month - i, category)] for i in range(window)]
+            series.append((current, sum(trailing) / window, current - spending[(month - 12, category)]))
+        result[category] = series
+    return result
+
+
+def timed(label, func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"  {label:<36} {best * 1000:10.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the spending trends analytics')
+    parser.add_argument('--transactions', type=int, default=1_000_000, help='Number of synthetic transactions')
+    parser.add_argument('--years', type=int, default=5, help='Years of history to spread them over')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement (best is reported)')
+    parser.add_argument('--store', action='store_true', help='Also time loading columns from SQLite')
+    parser.add_argument('--skip-python', action='store_true', help='Skip the pure Python baseline')
+
+    args = parser.parse_args()
+
+    print(f"Generating {args.transactions:,} transactions over {args.years} years...")
+    rows = generate_rows(args.transactions, args.years)
+
+    today = date.today()
+    end_month = month_index(today.year, today.month)
+    start_month = end_month - args.years * 12 + 1
+
+    print("Results (best of {}):".format(args.repeat))
+    columns = timed("build columns from tuples", lambda: TransactionColumns.from_rows([rows]), args.repeat)
+    timed("vectorized trends", lambda: spending_trends(columns, start_month, end_month), args.repeat)
+
+    if not args.skip_python:
+        timed("pure Python trends", lambda: python_trends(rows, start_month, end_month), args.repeat)
+
+    if args.store:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = TransactionStore(os.path.join(tmp, "benchmark.db"))
+            by_account = defaultdict(list)
+            for i, (tx_date, cents, category, account_id) in enumerate(rows):
+                by_account[account_id].append({"id": f"txn_{i}", "date": tx_date, "amount": f"{cents / 100:.2f}"})
+            for account_id, transactions in by_account.items():
+                store.upsert_transactions(account_id, transactions)
+            timed("load columns from SQLite", lambda: TransactionColumns.from_store(store), args.repeat)
+            store.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+import sys
+import time
+import random
+import argparse
+from datetime import date, timedelta
+
+from config import Config
+from models import Transaction
+from sheets_client import GoogleSheetsClient
+from sheet_backend import LocalSheetBackend
+
+CATEGORIES = ["Food & Dining", "Groceries", "Shopping", "Entertainment", "Transportation", "Utilities"]
+
+
+def generate_transactions(count, seed=42):
+    """Synthetic transactions spread over the last two years"""
+    rng = random.Random(seed)
+    end = date.today()
+    transactions = []
+    for i in range(count):
+        transactions.append(Transaction(
+            id=f"txn_{i:08d}",
+            account_id=f"acc_{rng.randrange(4)}",
+            date=(end - timedelta(days=rng.randrange(730))).isoformat(),
+            account_name="Checking",
+            description=f"Merchant {rng.randrange(500)}",
+            amount=f"-{rng.randint(50, 30000) / 100:.2f}",
+            category=rng.choice(CATEGORIES),
+        ))
+    return transactions
+
+
+def changed(transactions, fraction, seed=7):
+    """Copies of the transactions with a fraction of them recategorized"""
+    rng = random.Random(seed)
+    result = []
+    for tx in transactions:
+        if rng.random() < fraction:
+            tx = tx.model_copy(update={"category": rng.choice(CATEGORIES + ["Travel"])})
+        result.append(tx)
+    return result
+
+
+def run_exports(client, backend, transactions, batch_size):
+    """Export transactions in batches, returning (exports, stats, seconds)"""
+    backend.reset_stats()
+    exports = 0
+    start = time.perf_counter()
+    for i in range(0, len(transactions), batch_size):
+        result = client.append_transactions(transactions[i:i + batch_size])
+        if "error" in result:
+            raise RuntimeError(result["error"])
+        exports += 1
+    return exports, backend.stats(), time.perf_counter() - start
+
+
+def report(label, count, exports, stats, seconds):
+    calls = stats["total_calls"]
+    print(f"  {label:<22} {exports:>7} {calls:>7} {calls * 1000 / count:>10.2f} "
+          f"{stats['request_bytes'] / count:>9.0f} {seconds * 1000 / count:>9.3f} {seconds:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Google Sheets export path against a local sheet')
+    parser.add_argument('--transactions', type=int, default=20000, help='Number of synthetic transactions')
+    parser.add_argument('--batch-sizes', default='100,1000,5000', help='Comma-separated transactions per export')
+    parser.add_argument('--chunk-rows', type=int, help='Override SHEETS_CHUNK_ROWS')
+    parser.add_argument('--update-fraction', type=float, default=0.1, help='Share of transactions changed on re-export')
+    parser.add_argument('--latency', type=float, default=0.0, help='Simulated seconds per API call')
+
+    args = parser.parse_args()
+
+    if args.chunk_rows:
+        Config.SHEETS_CHUNK_ROWS = args.chunk_rows
+    batch_sizes = [int(size) for size in args.batch_sizes.split(',')]
+
+    print(f"Generating {args.transactions:,} transactions...")
+    transactions = generate_transactions(args.transactions)
+    updated = changed(transactions, args.update_fraction)
+
+    print(f"Chunks of {Config.SHEETS_CHUNK_ROWS} rows, {args.latency * 1000:.0f} ms simulated latency per call")
+    print(f"  {'phase':<22} {'exports':>7} {'calls':>7} {'calls/1k tx':>10} "
+          f"{'bytes/tx':>9} {'ms/tx':>9} {'total s':>8}")
+
+    for batch_size in batch_sizes:
+        backend = LocalSheetBackend(latency=args.latency)
+        client = GoogleSheetsClient(backend=backend)
+
+        report(f"insert, batch {batch_size}", len(transactions),
+               *run_exports(client, backend, transactions, batch_size))
+        report(f"re-export, batch {batch_size}", len(updated),
+               *run_exports(client, backend, updated, batch_size))
+
+        rows = backend.sheet_values('Transactions')
+        if len(rows) - 1 != len(transactions):
+            print(f"Sheet has {len(rows) - 1} rows, expected {len(transactions)}")
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,476 @@
+import re
+from collections import deque
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import re._parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+RULE_TYPES = ('substring', 'word', 'prefix', 'regex', 'amount')
+MAX_PATTERN_LENGTH = 500
+# Longest run of overlapping unbounded repeats (like .*.*) a regex rule may
+# have; each one in the run multiplies the backtracking by the text length
+MAX_OVERLAPPING_REPEATS = 2
+# Bounded repeats with more optional iterations than this count as unbounded
+MAX_REPEAT_SPAN = 20
+
+_REPEATS = (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT)
+# Characters used to tell whether two parts of a regex can match the same text
+_SAMPLE_CHARS = ''.join(chr(code) for code in range(32, 127)).lower() + '\t\n\xa0\xe9'
+_CATEGORIES = {
+    sre_parse.CATEGORY_DIGIT: re.compile(r'\d'),
+    sre_parse.CATEGORY_NOT_DIGIT: re.compile(r'\D'),
+    sre_parse.CATEGORY_SPACE: re.compile(r'\s'),
+    sre_parse.CATEGORY_NOT_SPACE: re.compile(r'\S'),
+    sre_parse.CATEGORY_WORD: re.compile(r'\w'),
+    sre_parse.CATEGORY_NOT_WORD: re.compile(r'\W'),
+}
+_DIGIT_RUN = re.compile(r'\d+')
+_WHITESPACE_RUN = re.compile(r'\s+')
+
+
+class PatternMatcher:
+    """
+    Aho-Corasick automaton over case-insensitive substring patterns.
+
+    Matching a description costs O(len(description) + matches) no matter how
+    many patterns are loaded. Patterns are identified by their position in the
+    list passed to the constructor, which is also their priority: a lower
+    index wins when several patterns match the same text.
+    """
+
+    def __init__(self, patterns: List[str]):
+        self.patterns = list(patterns)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+
+        for index, pattern in enumerate(self.patterns):
+            self._add_pattern(pattern.lower(), index)
+        self._build_failure_links()
+
+    def _add_pattern(self, pattern: str, index: int) -> None:
+        """Add a lowercased pattern to the trie"""
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][char] = next_state
+            state = next_state
+        self._output[state].append(index)
+
+    def _build_failure_links(self) -> None:
+        """Compute failure links breadth-first and merge outputs along them"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state].extend(self._output[self._fail[next_state]])
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int]]:
+        """
+        Yield every occurrence of every pattern in already lowercased text
+
+        Yields:
+            Tuple[int, int]: Pattern index and the offset just past the match
+        """
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+
+        for index in output[0]:  # Empty patterns match everything
+            yield index, 0
+
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in output[state]:
+                yield index, position + 1
+
+    def find_all(self, text: str) -> List[int]:
+        """
+        Find every pattern contained in text
+
+        Args:
+            text: The text to search (compared case-insensitively)
+
+        Returns:
+            List[int]: Indices of matching patterns, highest priority first
+        """
+        return sorted({index for index, _ in self.iter_matches(text.lower())})
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == '_'
+
+
+def _subpatterns(value) -> Iterator[Any]:
+    """Parsed sub-patterns nested in the value of a regex opcode"""
+    items = value if isinstance(value, (tuple, list)) else (value,)
+    for item in items:
+        if isinstance(item, sre_parse.SubPattern):
+            yield item
+        elif isinstance(item, list):
+            yield from (sub for sub in item if isinstance(sub, sre_parse.SubPattern))
+
+
+def _first_chars(parsed) -> Optional[frozenset]:
+    """
+    Lowercased characters a parsed regex can start with, or None if that
+    can't be narrowed down (including when it can match the empty string)
+    """
+    for op, value in parsed:
+        if op in (sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            continue  # Zero-width
+        if op == sre_parse.LITERAL:
+            return frozenset(chr(value).lower())
+        if op == sre_parse.IN:
+            if any(item_op != sre_parse.LITERAL for item_op, _ in value):
+                return None
+            return frozenset(chr(item_value).lower() for _, item_value in value)
+        if op == sre_parse.SUBPATTERN:
+            return _first_chars(value[-1])
+        if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            return _first_chars(value[2]) if value[0] > 0 else None
+        if op == sre_parse.BRANCH:
+            chars = frozenset()
+            for branch in value[1]:
+                branch_chars = _first_chars(branch)
+                if branch_chars is None:
+                    return None
+                chars |= branch_chars
+            return chars
+        return None
+    return None
+
+
+def _branches_overlap(branches) -> bool:
+    """Whether more than one alternative could match at the same position, e.g. a|aa"""
+    seen = frozenset()
+    for branch in branches:
+        chars = _first_chars(branch)
+        if chars is None or chars & seen:
+            return True
+        seen |= chars
+    return False
+
+
+def _has_nested_repeat(parsed, inside_repeat: bool = False) -> bool:
+    """
+    Detect regexes that can backtrack exponentially: a variable-length repeat
+    inside another repeat, e.g. (a+)+ or (.*a){12}, or alternatives that can
+    match the same text inside a repeat, e.g. (a|aa)+
+    """
+    for op, value in parsed:
+        if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            min_count, max_count, body = value
+            if inside_repeat and min_count != max_count:
+                return True
+            if _has_nested_repeat(body, inside_repeat or max_count > 1):
+                return True
+        elif op == sre_parse.BRANCH:
+            if inside_repeat and _branches_overlap(value[1]):
+                return True
+            for branch in value[1]:
+                if _has_nested_repeat(branch, inside_repeat):
+                    return True
+        else:
+            for sub in _subpatterns(value):
+                if _has_nested_repeat(sub, inside_repeat):
+                    return True
+    return False
+
+
+def _in_matches(items, char: str) -> bool:
+    """Whether a character class ([...]) matches char"""
+    negate = bool(items) and items[0][0] == sre_parse.NEGATE
+    for op, value in items[1:] if negate else items:
+        if op == sre_parse.LITERAL and chr(value) == char:
+            return not negate
+        if op == sre_parse.RANGE and value[0] <= ord(char) <= value[1]:
+            return not negate
+        if op == sre_parse.CATEGORY and value in _CATEGORIES and _CATEGORIES[value].match(char):
+            return not negate
+    return negate
+
+
+def _sample_chars(parsed) -> frozenset:
+    """
+    Characters from _SAMPLE_CHARS that a parsed regex could consume anywhere,
+    ignoring case (as rules are matched)
+    """
+    chars = set()
+    for op, value in parsed:
+        if op == sre_parse.ANY or op == sre_parse.GROUPREF:
+            return frozenset(_SAMPLE_CHARS)
+        if op == sre_parse.LITERAL:
+            chars.add(chr(value).lower())
+        elif op == sre_parse.NOT_LITERAL:
+            chars.update(char for char in _SAMPLE_CHARS if char != chr(value).lower())
+        elif op == sre_parse.IN:
+            chars.update(
+                char for char in _SAMPLE_CHARS
+                if _in_matches(value, char) or _in_matches(value, char.upper())
+            )
+        elif op not in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):  # Lookarounds consume nothing
+            for sub in _subpatterns(value):
+                chars |= _sample_chars(sub)
+    return frozenset(chars)
+
+
+def _sequence(parsed) -> Iterator[Any]:
+    """The elements of a parsed regex one at a time, with groups spliced in"""
+    for index, (op, value) in enumerate(parsed):
+        if op == sre_parse.SUBPATTERN:
+            yield from _sequence(value[-1])
+        else:
+            yield parsed[index:index + 1]
+
+
+def _has_overlapping_repeats(parsed) -> bool:
+    """
+    Detect regexes that can backtrack polynomially: more than
+    MAX_OVERLAPPING_REPEATS unbounded repeats in a row that can match the same
+    characters, e.g. .*.*.*= or (.*)(.*)(.*)x. Anything between them that
+    those repeats could also match, or that can be empty, doesn't break the run.
+    """
+    run_chars = frozenset()
+    run_length = 0
+    for element in _sequence(parsed):
+        op, value = element[0]
+        can_be_empty = element.getwidth()[0] == 0
+
+        if op in _REPEATS and value[1] - value[0] > MAX_REPEAT_SPAN:
+            chars = _sample_chars(value[2])
+            if run_length and chars & run_chars:
+                run_length += 1
+                run_chars |= chars
+            elif not (run_length and can_be_empty):
+                run_length = 1
+                run_chars = chars
+            if run_length > MAX_OVERLAPPING_REPEATS:
+                return True
+        elif not can_be_empty and not _sample_chars(element) <= run_chars:
+            run_length = 0
+            run_chars = frozenset()
+
+        # Alternatives, repeat bodies and lookarounds are sequences of their own
+        for sub in _subpatterns(value):
+            if _has_overlapping_repeats(sub):
+                return True
+    return False
+
+
+def _uses_group_reference(parsed) -> bool:
+    """Whether a parsed regex refers back to one of its groups, e.g. (x)\\1"""
+    for op, value in parsed:
+        if op in (sre_parse.GROUPREF, sre_parse.GROUPREF_EXISTS):
+            return True
+        for sub in _subpatterns(value):
+            if _uses_group_reference(sub):
+                return True
+    return False
+
+
+def validate_rule(pattern: str,
+                  rule_type: str = 'substring',
+                  min_amount: Optional[float] = None,
+                  max_amount: Optional[float] = None) -> Optional[str]:
+    """
+    Check that a mapping rule is well formed and safe to run on every transaction
+
+    Args:
+        pattern: The pattern text (ignored for matching by amount rules)
+        rule_type: One of RULE_TYPES
+        min_amount: Lower bound on the transaction amount (optional)
+        max_amount: Upper bound on the transaction amount (optional)
+
+    Returns:
+        Optional[str]: An error message, or None if the rule is valid
+    """
+    if rule_type not in RULE_TYPES:
+        return f"Unknown rule type '{rule_type}'. Expected one of: {', '.join(RULE_TYPES)}"
+    if len(pattern) > MAX_PATTERN_LENGTH:
+        return f"Pattern is longer than {MAX_PATTERN_LENGTH} characters"
+    if min_amount is not None and max_amount is not None and min_amount > max_amount:
+        return "min_amount cannot be greater than max_amount"
+    if rule_type == 'amount' and min_amount is None and max_amount is None:
+        return "Amount rules need min_amount and/or max_amount"
+    if rule_type in ('word', 'prefix') and not pattern:
+        return "Pattern cannot be empty"
+
+    if rule_type == 'regex':
+        try:
+            parsed = sre_parse.parse(pattern)
+        except re.error as e:
+            return f"Invalid regular expression: {e}"
+        # Nested or ambiguous repeats can backtrack exponentially and block the server
+        if _has_nested_repeat(parsed):
+            return "Regular expression has nested or ambiguous repetition and could run too slowly"
+        if _has_overlapping_repeats(parsed):
+            return "Regular expression has too many overlapping repeats (like .*.*.*) and could run too slowly"
+
+    return None
+
+
+def normalize_description(description: str) -> str:
+    """
+    Collapse the parts of a description that vary between otherwise identical
+    transactions: store numbers, dates and reference codes lose their digits
+    (each run becomes a single 0) and whitespace runs become one space.
+
+    Substring, word and prefix rules without digits match the normalized text
+    exactly when they match the original.
+    """
+    return _WHITESPACE_RUN.sub(' ', _DIGIT_RUN.sub('0', description.lower()))
+
+
+def parse_cents(amount: Any) -> Optional[int]:
+    """
+    Parse a Teller amount string into integer cents, exactly (no float rounding),
+    returning None if it isn't a number
+    """
+    if amount is None or amount == '':
+        return None
+    try:
+        cents = Decimal(str(amount)).scaleb(2).to_integral_value(rounding=ROUND_HALF_UP)
+    except (InvalidOperation, ValueError):
+        return None
+    return int(cents) if cents.is_finite() else None
+
+
+class RuleMatcher:
+    """
+    Compiled form of a list of categorization rules.
+
+    Each rule is a dict with 'pattern', 'type' and optional 'min_amount' /
+    'max_amount' keys. The amount bounds are converted to integer cents once,
+    when the matcher is built, and compared against amounts in cents.
+    Substring, word and prefix rules share one Aho-Corasick automaton and
+    treat any run of whitespace as a single space. All regex rules are
+    combined into a single alternation that rejects non-matching descriptions
+    in one pass before individual regexes are tried. Rule priority is list
+    order, as with PatternMatcher. Invalid rules are skipped.
+
+    normalization_safe tells whether matching normalize_description(text)
+    always gives the same result as matching text itself.
+    """
+
+    def __init__(self, rules: List[Dict[str, Any]]):
+        self.rules = list(rules)
+        self.has_amount_rules = False
+        self.normalization_safe = True
+
+        literal_patterns = []
+        self._literal_rules: List[int] = []
+        self._regexes: List[Tuple[int, Any]] = []
+        self._amount_only: List[int] = []
+        self._amount_bounds: Dict[int, Tuple[Optional[int], Optional[int]]] = {}  # Rule index -> cents
+
+        for index, rule in enumerate(self.rules):
+            pattern = rule.get('pattern', '')
+            rule_type = rule.get('type', 'substring')
+            error = validate_rule(pattern, rule_type, rule.get('min_amount'), rule.get('max_amount'))
+            if error:
+                print(f"Skipping mapping rule '{pattern}': {error}")
+                continue
+
+            if rule.get('min_amount') is not None or rule.get('max_amount') is not None:
+                self.has_amount_rules = True
+                self._amount_bounds[index] = (parse_cents(rule.get('min_amount')), parse_cents(rule.get('max_amount')))
+
+            if rule_type == 'regex':
+                self._regexes.append((index, re.compile(pattern, re.IGNORECASE)))
+                self.normalization_safe = False
+            elif rule_type == 'amount':
+                self._amount_only.append(index)
+            else:
+                literal_patterns.append(_WHITESPACE_RUN.sub(' ', pattern.lower()))
+                if _DIGIT_RUN.search(pattern):
+                    self.normalization_safe = False
+                self._literal_rules.append(index)
+
+        self._literals = PatternMatcher(literal_patterns)
+        self._combined_regex = None
+        # Joining the regexes would shift group numbers, so a backreference in any
+        # of them could point at another rule's group
+        if self._regexes and not any(
+            _uses_group_reference(sre_parse.parse(regex.pattern)) for _, regex in self._regexes
+        ):
+            try:
+                self._combined_regex = re.compile(
+                    '|'.join(f'(?:{regex.pattern})' for _, regex in self._regexes),
+                    re.IGNORECASE
+                )
+            except re.error:
+                # Rules using group names or inline flags can't be combined, so
+                # fall back to trying each regex
+                self._combined_regex = None
+
+    def _amount_matches(self, index: int, amount_cents: Optional[int]) -> bool:
+        bounds = self._amount_bounds.get(index)
+        if bounds is None:
+            return True
+        if amount_cents is None:
+            return False
+        min_cents, max_cents = bounds
+        if min_cents is not None and amount_cents < min_cents:
+            return False
+        if max_cents is not None and amount_cents > max_cents:
+            return False
+        return True
+
+    def find_all(self, description: str, amount_cents: Optional[int] = None) -> List[int]:
+        """
+        Find every rule matching a transaction
+
+        Args:
+            description: Transaction description (compared case-insensitively)
+            amount_cents: Transaction amount in cents (see parse_cents), needed
+                for rules with amount bounds
+
+        Returns:
+            List[int]: Indices of matching rules, highest priority first
+        """
+        matches = set()
+        text = _WHITESPACE_RUN.sub(' ', description.lower())
+
+        for literal_index, end in self._literals.iter_matches(text):
+            index = self._literal_rules[literal_index]
+            if index in matches:
+                continue
+            rule = self.rules[index]
+            rule_type = rule.get('type', 'substring')
+            if rule_type != 'substring':
+                start = end - len(self._literals.patterns[literal_index])
+                if start != 0 and (rule_type == 'prefix' or _is_word_char(text[start - 1])):
+                    continue
+                if rule_type == 'word' and end < len(text) and _is_word_char(text[end]):
+                    continue
+            if self._amount_matches(index, amount_cents):
+                matches.add(index)
+
+        if self._regexes and (self._combined_regex is None or self._combined_regex.search(description)):
+            for index, regex in self._regexes:
+                if self._amount_matches(index, amount_cents) and regex.search(description):
+                    matches.add(index)
+
+        for index in self._amount_only:
+            if self._amount_matches(index, amount_cents):
+                matches.add(index)
+
+        return sorted(matches)
@@ -0,0 +1,43 @@
+import os
+
+from dotenv import load_dotenv
+
+# Settings come from the environment; a .env file in the working directory fills in the rest
+load_dotenv()
+
+
+class Config:
+    TELLER_BASE_URL = os.environ.get('TELLER_BASE_URL', 'https://api.teller.io')
+    CERT_PATH = os.environ.get('TELLER_CERT_PATH')
+    KEY_PATH = os.environ.get('TELLER_KEY_PATH')
+    GOOGLE_SHEET_ID = os.environ.get('GOOGLE_SHEET_ID')
+    GOOGLE_CREDS_PATH = os.environ.get('GOOGLE_CREDS_PATH')
+    SHEETS_BACKEND = os.environ.get('SHEETS_BACKEND', 'google')  # 'google' or 'local'
+    SHEETS_LOCAL_PATH = os.environ.get('SHEETS_LOCAL_PATH', 'local_sheets')
+    CATEGORIES_FILE = os.environ.get('CATEGORIES_FILE', 'categories.json')
+    TRANSACTION_MAPPING_FILE = os.environ.get('TRANSACTION_MAPPING_FILE', 'transaction_mappings.json')
+    CREDS_DIR = os.environ.get('CREDS_DIR', 'creds')
+    SAVE_DELAY_SECONDS = float(os.environ.get('SAVE_DELAY_SECONDS', 0.5))
+    STATE_BACKEND = os.environ.get('STATE_BACKEND', 'json')  # 'json' or 'sqlite'
+    STATE_DB = os.environ.get('STATE_DB', 'state.db')
+    STATIC_DIR = os.environ.get('STATIC_DIR', 'static')
+    HTML_TEMPLATE_DIR = os.environ.get('HTML_TEMPLATE_DIR', 'templates')
+    TRANSACTIONS_DB = os.environ.get('TRANSACTIONS_DB', 'transactions.db')
+    SYNC_INTERVAL_SECONDS = int(os.environ.get('SYNC_INTERVAL_SECONDS', 300))
+    SYNC_LOOKBACK_DAYS = int(os.environ.get('SYNC_LOOKBACK_DAYS', 10))
+    TELLER_PAGE_SIZE = int(os.environ.get('TELLER_PAGE_SIZE', 250))
+    CATEGORY_CACHE_SIZE = int(os.environ.get('CATEGORY_CACHE_SIZE', 10000))
+    TELLER_POOL_SIZE = int(os.environ.get('TELLER_POOL_SIZE', 10))
+    TELLER_CONNECT_TIMEOUT = float(os.environ.get('TELLER_CONNECT_TIMEOUT', 5))
+    TELLER_READ_TIMEOUT = float(os.environ.get('TELLER_READ_TIMEOUT', 30))
+    TELLER_FANOUT_CONCURRENCY = int(os.environ.get('TELLER_FANOUT_CONCURRENCY', 8))
+    TELLER_CACHE_SIZE = int(os.environ.get('TELLER_CACHE_SIZE', 1000))
+    TELLER_CACHE_ACCOUNTS_TTL = float(os.environ.get('TELLER_CACHE_ACCOUNTS_TTL', 300))
+    TELLER_CACHE_DETAILS_TTL = float(os.environ.get('TELLER_CACHE_DETAILS_TTL', 3600))
+    TELLER_CACHE_BALANCES_TTL = float(os.environ.get('TELLER_CACHE_BALANCES_TTL', 60))
+    SHEETS_MAX_RETRIES = int(os.environ.get('SHEETS_MAX_RETRIES', 5))
+    SHEETS_RETRY_BASE_DELAY = float(os.environ.get('SHEETS_RETRY_BASE_DELAY', 1))
+    SHEETS_RETRY_MAX_DELAY = float(os.environ.get('SHEETS_RETRY_MAX_DELAY', 32))
+    SHEETS_CHUNK_ROWS = int(os.environ.get('SHEETS_CHUNK_ROWS', 2000))
+    SHEETS_CHUNK_BYTES = int(os.environ.get('SHEETS_CHUNK_BYTES', 1000000))
+    SHEETS_GRID_GROWTH = int(os.environ.get('SHEETS_GRID_GROWTH', 10000))
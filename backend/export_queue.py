@@ -0,0 +1,142 @@
+import uuid
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+
+class ExportQueue:
+    """
+    Runs Google Sheets exports on a background thread, one at a time.
+
+    Each submitted export becomes a job that can be polled by ID. While a job
+    is still waiting to run, further exports are merged into it (the latest
+    copy of each transaction wins), so a burst of overlapping exports costs a
+    single pass over the sheet.
+    """
+
+    def __init__(self,
+                 export_func: Callable[..., Dict[str, Any]],
+                 max_finished_jobs: int = 100):
+        """
+        Args:
+            export_func: Called as export_func(transactions, progress=callback) and
+                returns a result dict, with an 'error' key if the export failed.
+                callback(done, total) may be called to report progress.
+            max_finished_jobs: Number of completed or failed jobs kept for polling
+        """
+        self.export_func = export_func
+        self.max_finished_jobs = max_finished_jobs
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._transactions: Dict[str, Dict[str, Any]] = {}  # Job ID -> {transaction ID: transaction}
+        self._pending: Optional[str] = None  # ID of the queued job accepting merges
+        self._queue: List[str] = []
+        self._condition = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self._stopping = False
+
+    def submit(self, transactions: List[Any]) -> Dict[str, Any]:
+        """
+        Queue transactions for export
+
+        Args:
+            transactions: Transaction models (anything with an id attribute)
+
+        Returns:
+            Dict: A snapshot of the job the transactions were added to
+        """
+        with self._condition:
+            if self._stopping:
+                raise RuntimeError("Export queue is shutting down")
+
+            job_id = self._pending
+            if job_id is None:
+                job_id = str(uuid.uuid4())
+                self._jobs[job_id] = {
+                    "id": job_id,
+                    "status": "queued",
+                    "submissions": 0,
+                    "transaction_count": 0,
+                    "progress": {"done": 0, "total": 0},
+                    "result": None,
+                    "error": None,
+                    "created_at": datetime.now().isoformat(),
+                    "started_at": None,
+                    "finished_at": None,
+                }
+                self._transactions[job_id] = {}
+                self._pending = job_id
+                self._queue.append(job_id)
+
+            merged = self._transactions[job_id]
+            for tx in transactions:
+                merged[tx.id] = tx
+
+            job = self._jobs[job_id]
+            job["submissions"] += 1
+            job["transaction_count"] = len(merged)
+
+            self._ensure_worker()
+            self._condition.notify()
+            return dict(job)
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a snapshot of a job, or None if it is unknown or has been forgotten"""
+        with self._condition:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def shutdown(self, timeout: Optional[float] = None) -> None:
+        """Stop accepting jobs and wait for queued ones to finish"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+            worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="sheets-export", daemon=True)
+            self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._queue and not self._stopping:
+                    self._condition.wait()
+                if not self._queue:
+                    return
+
+                job_id = self._queue.pop(0)
+                if self._pending == job_id:
+                    self._pending = None
+                job = self._jobs[job_id]
+                job["status"] = "running"
+                job["started_at"] = datetime.now().isoformat()
+                transactions = list(self._transactions.pop(job_id).values())
+
+            def progress(done: int, total: int) -> None:
+                with self._condition:
+                    job["progress"] = {"done": done, "total": total}
+
+            try:
+                result = self.export_func(transactions, progress=progress)
+            except Exception as e:
+                result = {"error": f"Export failed: {e}"}
+
+            with self._condition:
+                job["finished_at"] = datetime.now().isoformat()
+                if "error" in result:
+                    job["status"] = "failed"
+                    job["error"] = result["error"]
+                else:
+                    job["status"] = "completed"
+                    job["result"] = result
+                self._prune()
+
+    def _prune(self) -> None:
+        """Forget the oldest finished jobs beyond max_finished_jobs"""
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in ("completed", "failed")]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self._jobs[job_id]
@@ -0,0 +1,74 @@
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, model_validator
+
+from category_matcher import parse_cents, validate_rule
+
+
+class Category(BaseModel):
+    id: Optional[str] = None
+    name: str
+    color: Optional[str] = None
+
+class CategoryUpdate(BaseModel):
+    name: Optional[str] = None
+    color: Optional[str] = None
+
+class Mapping(BaseModel):
+    pattern: str
+    category_id: str
+    type: str = 'substring'  # substring, word, prefix, regex or amount
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+
+    @model_validator(mode='after')
+    def check_rule(self):
+        error = validate_rule(self.pattern, self.type, self.min_amount, self.max_amount)
+        if error:
+            raise ValueError(error)
+        return self
+
+class CategoryChanges(BaseModel):
+    add: List[Category] = []
+    update: Dict[str, CategoryUpdate] = {}  # Category ID -> fields to change
+    delete: List[str] = []  # Category IDs
+
+class MappingChanges(BaseModel):
+    upsert: List[Mapping] = []
+    delete: List[str] = []  # Patterns, removed after upsert is applied
+
+class Transaction(BaseModel):
+    id: str
+    date: str
+    account_id: str
+    account_name: str
+    description: str
+    amount: str
+    amount_cents: Optional[int] = None  # Parsed from amount if not given
+    category: Optional[str] = None
+    notes: Optional[str] = None
+    
+    @model_validator(mode='after')
+    def fill_amount_cents(self):
+        if self.amount_cents is None:
+            self.amount_cents = parse_cents(self.amount)
+        return self
+
+class TransactionBatch(BaseModel):
+    transactions: List[Transaction]
+
+class TransactionCategory(BaseModel):
+    category: str
+
+class TellerEnrollment(BaseModel):
+    accessToken: str
+    user: Dict[str, Any]
+    enrollment: Dict[str, Any]
+    signatures: Optional[List[str]] = None
+
+class TellerTokenInfo(BaseModel):
+    institution_name: str
+    access_token: Optional[str] = None
+    institution_id: Optional[str] = None
+    user_id: Optional[str] = None
+    enrollment_id: Optional[str] = None
@@ -0,0 +1,154 @@
+import os
+import json
+import atexit
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import IO, Any, Callable, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def write_json_atomic(path: str, data: Any) -> None:
+    """
+    Write data as JSON to a temporary file next to path and rename it into
+    place, so readers and crashes never see a partially written file
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def lock_for_process(path: str) -> Optional[IO]:
+    """
+    Take an exclusive lock on a lock file next to path, held until the
+    process exits (or the returned file is closed)
+
+    Returns:
+        Optional[IO]: The open lock file, which the caller must keep a
+        reference to, or None if another process holds the lock
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    lock_file = open(os.path.join(directory, f".{os.path.basename(path)}.lock"), "a")
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+class JsonFile:
+    """
+    A JSON file holding some in-memory state, saved atomically and lazily.
+
+    Mutations are made inside update(), which marks the state as changed.
+    The file is written at most delay seconds after the first unsaved change,
+    so a burst of mutations costs one write. flush() writes any pending
+    changes immediately and is also called at interpreter exit. With a delay
+    of 0 every update() is written before it returns.
+
+    changed_on_disk() tells whether another process has replaced the file
+    since it was last loaded or written here. Changes made here while the
+    file is replaced elsewhere are not merged, so only one process should
+    write a file at a time (see lock_for_process).
+    """
+
+    def __init__(self, path: str, snapshot: Callable[[], Any], delay: float = 0.0):
+        """
+        Args:
+            path: File to read and write
+            snapshot: Returns the current state to save; called under the lock
+            delay: Seconds to wait for more changes before writing
+        """
+        self.path = path
+        self.snapshot = snapshot
+        self.delay = delay
+        self.lock = threading.RLock()
+        self._dirty = False
+        self._timer: Optional[threading.Timer] = None
+        self._stamp: Optional[Tuple[int, int, int]] = None  # File identity when last loaded or written
+        atexit.register(self.flush)
+
+    def _disk_stamp(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        # Every write renames a new file into place, so the inode changes too
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def changed_on_disk(self) -> bool:
+        """
+        Whether the file was replaced by someone else since it was last loaded
+        or written here. Always False while local changes are waiting to be
+        written, since they will replace the file anyway.
+        """
+        with self.lock:
+            return not self._dirty and self._disk_stamp() != self._stamp
+
+    def load(self, default: Any) -> Any:
+        """Read the file, or return default if it doesn't exist or can't be parsed"""
+        self._stamp = self._disk_stamp()
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, "r") as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"Error loading {self.path}: {e}")
+        return default
+
+    @contextmanager
+    def update(self) -> Iterator[None]:
+        """Hold the lock while mutating the state, then schedule a save"""
+        with self.lock:
+            yield
+            self._dirty = True
+            if self.delay <= 0:
+                self.flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> bool:
+        """
+        Write pending changes now
+
+        Returns:
+            bool: False if the write failed, True otherwise (including when
+            there was nothing to write)
+        """
+        with self.lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return True
+            try:
+                write_json_atomic(self.path, self.snapshot())
+                self._stamp = self._disk_stamp()
+                self._dirty = False
+                return True
+            except Exception as e:
+                print(f"Error saving {self.path}: {e}")
+                return False
@@ -0,0 +1,120 @@
+import copy
+import time
+import asyncio
+from collections import Counter, OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+CacheKey = Tuple[str, str, Hashable]  # (token, kind, argument)
+
+
+class ResponseCache:
+    """
+    Size-bounded TTL cache for upstream API responses, keyed by access token,
+    kind of request (e.g. 'accounts') and its argument.
+
+    Entries expire after a TTL chosen per call and the least recently used
+    entries are evicted beyond max_entries. Concurrent requests for the same
+    key while it is being fetched share a single upstream call. Error
+    responses (dicts with an 'error' key) are returned but not cached.
+    """
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Any]]" = OrderedDict()  # Key -> (expires at, value)
+        self._inflight: Dict[CacheKey, asyncio.Future] = {}  # Fetches in progress
+        self._stats: Dict[str, Counter] = {}
+
+    async def get(self,
+                  token: str,
+                  kind: str,
+                  argument: Hashable,
+                  ttl: float,
+                  fetch: Callable[[], Awaitable[Any]],
+                  refresh: bool = False) -> Any:
+        """
+        Return the cached response for a request, or fetch it
+
+        Args:
+            token: Access token the request is made with
+            kind: Kind of request, used for per-kind statistics
+            argument: What distinguishes requests of the same kind (e.g. an account ID)
+            ttl: Seconds to keep a successful response; 0 disables caching
+            fetch: Makes the upstream request
+            refresh: Skip any cached response (a fetch already in flight is still shared)
+
+        Returns:
+            A copy of the response, so callers can modify it
+        """
+        key = (token, kind, argument)
+        stats = self._stats.setdefault(kind, Counter())
+
+        entry = self._entries.get(key)
+        if entry is not None and not refresh:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                stats["hits"] += 1
+                return copy.deepcopy(entry[1])
+            del self._entries[key]
+
+        future = self._inflight.get(key)
+        if future is None:
+            stats["misses"] += 1
+            future = asyncio.ensure_future(fetch())
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._store(key, ttl, done))
+        else:
+            stats["coalesced"] += 1
+
+        # Shielded so a caller going away doesn't cancel the fetch for the others
+        return copy.deepcopy(await asyncio.shield(future))
+
+    def _store(self, key: CacheKey, ttl: float, future: asyncio.Future) -> None:
+        # A fetch that was invalidated while in flight is no longer in _inflight
+        if self._inflight.get(key) is not future:
+            return
+        del self._inflight[key]
+        if future.cancelled() or future.exception() is not None:
+            return
+
+        value = future.result()
+        if ttl <= 0 or (isinstance(value, dict) and "error" in value):
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats.setdefault(key[1], Counter())["evictions"] += 1
+
+    def invalidate(self, token: Optional[str] = None, kind: Optional[str] = None) -> int:
+        """
+        Drop cached responses, all of them or only those for a token and/or kind
+
+        Returns:
+            int: Number of entries dropped
+        """
+        def matches(key: CacheKey) -> bool:
+            return (token is None or key[0] == token) and (kind is None or key[1] == kind)
+
+        keys = [key for key in self._entries if matches(key)]
+        for key in keys:
+            del self._entries[key]
+        # Fetches already in flight finish for their callers, but aren't cached
+        # and later callers start a new fetch
+        for key in [key for key in self._inflight if matches(key)]:
+            del self._inflight[key]
+        return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hits, misses, coalesced requests, evictions and hit rate per kind, and the cache size"""
+        kinds = {}
+        for kind, counts in self._stats.items():
+            lookups = counts["hits"] + counts["misses"] + counts["coalesced"]
+            kinds[kind] = {
+                "hits": counts["hits"],
+                "misses": counts["misses"],
+                "coalesced": counts["coalesced"],
+                "evictions": counts["evictions"],
+                # Coalesced requests didn't reach the upstream API either
+                "hit_rate": (counts["hits"] + counts["coalesced"]) / lookups if lookups else 0.0,
+            }
+        return {"size": len(self._entries), "max_entries": self.max_entries, "kinds": kinds}
@@ -0,0 +1,382 @@
+import os
+import re
+import csv
+import json
+import time
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Protocol, Tuple
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+DEFAULT_ROW_COUNT = 1000
+DEFAULT_COLUMN_COUNT = 26
+
+_A1_RE = re.compile(r"^(?:'((?:[^']|'')+)'|([^!]+))(?:!([A-Z]*)(\d*)(?::([A-Z]*)(\d*))?)?$")
+
+
+class SheetRequest:
+    """A pending API call; like the Google client's HttpRequest, nothing happens until execute()"""
+
+    def __init__(self, func: Callable[[], Dict[str, Any]]):
+        self._func = func
+
+    def execute(self) -> Dict[str, Any]:
+        return self._func()
+
+
+class SheetCall(Protocol):
+    """A pending API call, such as the Google client's HttpRequest or a SheetRequest"""
+
+    def execute(self) -> Dict[str, Any]: ...
+
+
+class SheetValues(Protocol):
+    """The values() collection of a SheetBackend"""
+
+    def get(self, spreadsheetId: str, range: str) -> SheetCall:
+        """{'values': [[...], ...]} for an A1 range"""
+        ...
+
+    def update(self, spreadsheetId: str, range: str, valueInputOption: str, body: Dict[str, Any]) -> SheetCall:
+        """Write body['values'] to an A1 range"""
+        ...
+
+
+class SheetBackend(Protocol):
+    """
+    The subset of the Sheets API spreadsheets() resource used by GoogleSheetsClient.
+
+    The resource returned by googleapiclient's build('sheets', 'v4').spreadsheets()
+    already has this shape, so it is used as-is. Other backends provide the same
+    methods without subclassing, each returning a call that runs on execute().
+    """
+
+    def get(self, spreadsheetId: str) -> SheetCall:
+        """Spreadsheet metadata with sheets[].properties"""
+        ...
+
+    def values(self) -> SheetValues:
+        ...
+
+    def batchUpdate(self, spreadsheetId: str, body: Dict[str, Any]) -> SheetCall:
+        """Apply body['requests'] atomically"""
+        ...
+
+
+class _LocalValues:
+    """values() collection of a LocalSheetBackend"""
+
+    def __init__(self, backend: "LocalSheetBackend"):
+        self._backend = backend
+
+    def get(self, spreadsheetId: str, range: str) -> SheetRequest:
+        return self._backend._request("values.get", {"range": range}, lambda: self._backend._get_values(range))
+
+    def update(self, spreadsheetId: str, range: str, valueInputOption: str, body: Dict[str, Any]) -> SheetRequest:
+        return self._backend._request(
+            "values.update", body, lambda: self._backend._update_values(range, body.get("values", []))
+        )
+
+
+class LocalSheetBackend:
+    """
+    In-process stand-in for a Google spreadsheet, for development and benchmarks.
+
+    Mimics the parts of the Sheets API the export path relies on: grids with a
+    fixed row count that must be grown explicitly, values().get trimming
+    trailing empty cells and rows, insertRange shifting cells down, and
+    batchUpdate applying all of its requests or none. Errors are raised as
+    HttpError like the real client. Every call is counted along with its
+    request and response payload size, see stats().
+
+    If path is set, each sheet is kept in <path>/<title>.csv, loaded on start
+    and saved after every write.
+    """
+
+    def __init__(self, path: Optional[str] = None, latency: float = 0.0):
+        """
+        Args:
+            path: Directory to persist sheets to as CSV files (optional)
+            latency: Seconds to sleep per call, to simulate network round trips
+        """
+        self.path = path
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._sheets: Dict[str, Dict[str, Any]] = {}  # Title -> {sheetId, rowCount, columnCount, rows}
+        self.reset_stats()
+
+        if path:
+            os.makedirs(path, exist_ok=True)
+            for name in sorted(os.listdir(path)):
+                if name.endswith(".csv"):
+                    with open(os.path.join(path, name), newline="", encoding="utf-8") as f:
+                        rows = [row for row in csv.reader(f)]
+                    self._add_sheet(name[:-4], max(DEFAULT_ROW_COUNT, len(rows)), DEFAULT_COLUMN_COUNT, rows)
+
+    def reset_stats(self) -> None:
+        """Reset the call and payload counters"""
+        self.calls: Counter = Counter()
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """API calls by method, total calls, and request/response payload bytes since the last reset"""
+        return {
+            "calls": dict(self.calls),
+            "total_calls": sum(self.calls.values()),
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+        }
+
+    def sheet_values(self, title: str) -> List[List[str]]:
+        """Copy of a sheet's cells, for inspection"""
+        with self._lock:
+            return [list(row) for row in self._sheet(title)["rows"]]
+
+    # Resource methods
+
+    def get(self, spreadsheetId: str) -> SheetRequest:
+        return self._request("get", None, self._metadata)
+
+    def values(self) -> _LocalValues:
+        return _LocalValues(self)
+
+    def batchUpdate(self, spreadsheetId: str, body: Dict[str, Any]) -> SheetRequest:
+        return self._request("batchUpdate", body, lambda: self._batch_update(body.get("requests", [])))
+
+    # Internals
+
+    def _request(self, method: str, body: Any, func: Callable[[], Dict[str, Any]]) -> SheetRequest:
+        def execute() -> Dict[str, Any]:
+            if self.latency:
+                time.sleep(self.latency)
+            with self._lock:
+                self.calls[method] += 1
+                if body is not None:
+                    self.request_bytes += len(json.dumps(body))
+                response = func()
+                self.response_bytes += len(json.dumps(response))
+                return response
+        return SheetRequest(execute)
+
+    def _error(self, status: int, message: str) -> HttpError:
+        content = json.dumps({"error": {"code": status, "message": message}}).encode()
+        return HttpError(httplib2.Response({"status": status}), content)
+
+    def _add_sheet(self, title: str, row_count: int, column_count: int, rows: Optional[List[List[str]]] = None) -> Dict[str, Any]:
+        sheet = {
+            "sheetId": max((s["sheetId"] for s in self._sheets.values()), default=-1) + 1,
+            "rowCount": row_count,
+            "columnCount": column_count,
+            "rows": rows or [],
+        }
+        self._sheets[title] = sheet
+        return sheet
+
+    def _sheet(self, title: str) -> Dict[str, Any]:
+        if title not in self._sheets:
+            raise self._error(400, f"Unable to parse range: {title}")
+        return self._sheets[title]
+
+    def _sheet_by_id(self, sheet_id: int) -> Tuple[str, Dict[str, Any]]:
+        for title, sheet in self._sheets.items():
+            if sheet["sheetId"] == sheet_id:
+                return title, sheet
+        raise self._error(400, f"No grid with id: {sheet_id}")
+
+    def _metadata(self) -> Dict[str, Any]:
+        return {"sheets": [
+            {"properties": {
+                "sheetId": sheet["sheetId"],
+                "title": title,
+                "gridProperties": {"rowCount": sheet["rowCount"], "columnCount": sheet["columnCount"]},
+            }}
+            for title, sheet in self._sheets.items()
+        ]}
+
+    def _parse_range(self, a1: str) -> Tuple[str, int, Optional[int], int, Optional[int]]:
+        """Parse 'Title!A1:I10' into (title, first row, end row, first column, end column), 0-based and exclusive"""
+        match = _A1_RE.match(a1)
+        if not match:
+            raise self._error(400, f"Unable to parse range: {a1}")
+        title = match.group(1).replace("''", "'") if match.group(1) else match.group(2)
+        start_col, start_row, end_col, end_row = match.group(3, 4, 5, 6)
+        if match.group(5) is None:
+            end_col, end_row = start_col, (start_row if start_col and start_row else None)
+        return (
+            title,
+            int(start_row) - 1 if start_row else 0,
+            int(end_row) if end_row else None,
+            _column_index(start_col) if start_col else 0,
+            _column_index(end_col) + 1 if end_col else None,
+        )
+
+    def _get_values(self, a1: str) -> Dict[str, Any]:
+        title, row0, row1, col0, col1 = self._parse_range(a1)
+        rows = []
+        for row in self._sheet(title)["rows"][row0:row1]:
+            row = list(row[col0:col1])
+            while row and row[-1] == "":
+                row.pop()
+            rows.append(row)
+        while rows and not rows[-1]:
+            rows.pop()
+
+        response: Dict[str, Any] = {"range": a1, "majorDimension": "ROWS"}
+        if rows:
+            response["values"] = rows
+        return response
+
+    def _update_values(self, a1: str, values: List[List[Any]]) -> Dict[str, Any]:
+        title, row0, _, col0, _ = self._parse_range(a1)
+        sheet = self._sheet(title)
+        rows = list(sheet["rows"])
+        self._write_cells(sheet, rows, row0, col0, [[_cell_text(value) for value in row] for row in values])
+        sheet["rows"] = rows
+        self._save(title)
+        return {"updatedRange": a1, "updatedRows": len(values)}
+
+    def _batch_update(self, requests: List[Dict[str, Any]]) -> Dict[str, Any]:
+        # Rows are only ever replaced, never modified in place, so shallow copies
+        # of the row lists are enough to roll back a failed batch
+        snapshot = {title: dict(sheet, rows=list(sheet["rows"])) for title, sheet in self._sheets.items()}
+        replies = []
+        try:
+            for request in requests:
+                replies.append(self._apply(request))
+        except Exception:
+            self._sheets = snapshot
+            raise
+
+        for title in self._sheets:
+            self._save(title)
+        return {"replies": replies}
+
+    def _apply(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        if "addSheet" in request:
+            properties = request["addSheet"].get("properties", {})
+            title = properties.get("title") or f"Sheet{len(self._sheets) + 1}"
+            if title in self._sheets:
+                raise self._error(400, f"A sheet with the name \"{title}\" already exists")
+            grid = properties.get("gridProperties", {})
+            sheet = self._add_sheet(title, grid.get("rowCount", DEFAULT_ROW_COUNT), grid.get("columnCount", DEFAULT_COLUMN_COUNT))
+            return {"addSheet": {"properties": {"sheetId": sheet["sheetId"], "title": title}}}
+
+        if "appendDimension" in request:
+            append = request["appendDimension"]
+            _, sheet = self._sheet_by_id(append["sheetId"])
+            key = "rowCount" if append["dimension"] == "ROWS" else "columnCount"
+            sheet[key] += append["length"]
+            return {}
+
+        if "insertDimension" in request:
+            dimension = request["insertDimension"]["range"]
+            _, sheet = self._sheet_by_id(dimension["sheetId"])
+            if dimension["dimension"] != "ROWS":
+                raise self._error(400, "Only ROWS are supported by the local backend")
+            start, end = dimension["startIndex"], dimension["endIndex"]
+            sheet["rows"][start:start] = [[] for _ in range(end - start)]
+            sheet["rowCount"] += end - start
+            return {}
+
+        if "insertRange" in request:
+            insert = request["insertRange"]
+            grid = insert["range"]
+            _, sheet = self._sheet_by_id(grid["sheetId"])
+            if insert["shiftDimension"] != "ROWS":
+                raise self._error(400, "Only shiftDimension ROWS is supported by the local backend")
+            self._insert_range(sheet, grid["startRowIndex"], grid["endRowIndex"],
+                               grid.get("startColumnIndex", 0), grid.get("endColumnIndex", sheet["columnCount"]))
+            return {}
+
+        if "updateCells" in request:
+            update = request["updateCells"]
+            start = update["start"]
+            _, sheet = self._sheet_by_id(start["sheetId"])
+            values = [[_cell_value(cell) for cell in row.get("values", [])] for row in update.get("rows", [])]
+            self._write_cells(sheet, sheet["rows"], start.get("rowIndex", 0), start.get("columnIndex", 0), values)
+            return {}
+
+        raise self._error(400, f"Unsupported request: {', '.join(request)}")
+
+    def _insert_range(self, sheet: Dict[str, Any], row0: int, row1: int, col0: int, col1: int) -> None:
+        """Insert empty cells in rows row0:row1 of columns col0:col1, shifting the cells below down"""
+        rows = sheet["rows"]
+        count = row1 - row0
+        last = None  # Last row with content in the shifted columns
+        for i in range(len(rows) - 1, row0 - 1, -1):
+            if any(rows[i][col0:col1]):
+                last = i
+                break
+        if last is None:
+            return
+        # Cells pushed past the last row of the grid would be lost, so the API refuses
+        if last + count >= sheet["rowCount"]:
+            raise self._error(400, f"Range exceeds grid limits. Max rows: {sheet['rowCount']}")
+
+        if col0 == 0 and all(len(row) <= col1 for row in rows[row0:]):
+            rows[row0:row0] = [[] for _ in range(count)]
+            return
+
+        rows.extend([] for _ in range(last + 1 + count - len(rows)))
+        for i in range(last + count, row0 - 1, -1):
+            source = rows[i - count][col0:col1] if i - count >= row0 else []
+            rows[i] = _splice(rows[i], col0, col1, source)
+
+    def _write_cells(self, sheet: Dict[str, Any], rows: List[List[str]], row0: int, col0: int, values: List[List[str]]) -> None:
+        if row0 + len(values) > sheet["rowCount"]:
+            raise self._error(400, f"Range exceeds grid limits. Max rows: {sheet['rowCount']}")
+        if any(col0 + len(row) > sheet["columnCount"] for row in values):
+            raise self._error(400, f"Range exceeds grid limits. Max columns: {sheet['columnCount']}")
+
+        while len(rows) < row0 + len(values):
+            rows.append([])
+        for i, row in enumerate(values):
+            rows[row0 + i] = _splice(rows[row0 + i], col0, col0 + len(row), row)
+
+    def _save(self, title: str) -> None:
+        if not self.path:
+            return
+        target = os.path.join(self.path, f"{title}.csv")
+        temp = target + ".tmp"
+        with open(temp, "w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows(self._sheets[title]["rows"])
+        os.replace(temp, target)
+
+
+def _column_index(letters: str) -> int:
+    """0-based index of a column letter such as 'A' or 'AB'"""
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord("A") + 1
+    return index - 1
+
+
+def _cell_text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    return str(value)
+
+
+def _cell_value(cell: Dict[str, Any]) -> str:
+    """Text of an updateCells CellData entry"""
+    value = cell.get("userEnteredValue", {})
+    for key in ("stringValue", "numberValue", "boolValue", "formulaValue"):
+        if key in value:
+            return _cell_text(value[key])
+    return ""
+
+
+def _splice(row: List[str], col0: int, col1: int, values: List[str]) -> List[str]:
+    """New row with columns col0:col1 replaced by values (padded with empty cells)"""
+    row = list(row)
+    if len(row) < col1:
+        row.extend([""] * (col1 - len(row)))
+    row[col0:col1] = list(values) + [""] * (col1 - col0 - len(values))
+    while row and row[-1] == "":
+        row.pop()
+    return row
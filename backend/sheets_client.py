@@ -0,0 +1,480 @@
+import time
+import random
+import threading
+from datetime import datetime
+
+from google.oauth2.service_account import Credentials
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+
+from config import Config
+from category_matcher import parse_cents
+
+
+class GoogleSheetsClient:
+    def __init__(self, backend=None, state=None):
+        """
+        Args:
+            backend: A SheetBackend to use instead of the Google Sheets API, such as
+                a LocalSheetBackend (optional)
+            state: StateStore shared with other processes exporting to the same
+                sheet. Each export bumps its 'sheets' revision, and the cached
+                sheet contents are dropped when another process has exported
+                since (optional)
+        """
+        self.creds = None
+        self.sheet = None
+        self.sheet_id = Config.GOOGLE_SHEET_ID
+        self._lock = threading.Lock()
+        # Cached for the lifetime of the client, dropped by refresh() or a failed write
+        self._transactions_sheet_id = None  # Numeric ID of the verified Transactions tab
+        self._row_index = None  # Transaction ID -> [row counter, row values]
+        self._row_top = 0  # Row number of a row = _row_top - its counter
+        self._grid_rows = 0  # Rows in the Transactions tab's grid, including the header
+        self._state = state
+        self._state_revision = None  # 'sheets' revision the caches above belong to
+        
+        if backend is not None:
+            self.sheet = backend
+            self.sheet_id = self.sheet_id or 'local'
+            self._ensure_transactions_sheet()
+        elif Config.GOOGLE_CREDS_PATH:
+            self.creds = Credentials.from_service_account_file(
+                Config.GOOGLE_CREDS_PATH,
+                scopes=['https://www.googleapis.com/auth/spreadsheets']
+            )
+            self.service = build('sheets', 'v4', credentials=self.creds)
+            self.sheet = self.service.spreadsheets()
+            
+            # Check and set up the transactions sheet if needed
+            self._ensure_transactions_sheet()
+
+    @property
+    def configured(self):
+        """Whether there is a sheet to export to"""
+        return self.sheet is not None and bool(self.sheet_id)
+
+    def _execute(self, request):
+        """
+        Execute a Sheets API request, retrying rate limit (429) and server (5xx)
+        errors with exponential backoff and jitter, up to SHEETS_MAX_RETRIES times
+        """
+        for attempt in range(Config.SHEETS_MAX_RETRIES + 1):
+            try:
+                return request.execute()
+            except HttpError as e:
+                status = e.resp.status
+                if (status != 429 and status < 500) or attempt == Config.SHEETS_MAX_RETRIES:
+                    raise
+                delay = min(Config.SHEETS_RETRY_BASE_DELAY * 2 ** attempt, Config.SHEETS_RETRY_MAX_DELAY)
+                retry_after = e.resp.get('retry-after')
+                if retry_after and retry_after.isdigit():
+                    delay = max(delay, float(retry_after))
+                delay *= random.uniform(0.5, 1)
+                print(f"Sheets API returned {status}, retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def refresh(self):
+        """Forget cached sheet metadata and row positions so they are re-read on the next export"""
+        with self._lock:
+            self._transactions_sheet_id = None
+            self._row_index = None
+            self._row_top = 0
+            if self._state is not None:
+                # Other processes refresh too
+                self._state_revision = self._state.bump('sheets', self._state_revision)
+    
+    def _check_shared_revision(self):
+        """Drop the caches if another process has written to the sheet since they were filled"""
+        revision = self._state.revision('sheets')
+        if revision != self._state_revision:
+            self._transactions_sheet_id = None
+            self._row_index = None
+            self._state_revision = revision
+
+    def _ensure_transactions_sheet(self, refresh=False):
+        """
+        Ensures the Transactions sheet exists with proper headers and returns the sheet ID.
+        The result is cached, so after the first call this makes no API calls unless
+        refresh is set.
+        """
+        if not self.configured:
+            return None
+        
+        if self._transactions_sheet_id is not None and not refresh:
+            return self._transactions_sheet_id
+            
+        try:
+            # Check if sheet exists
+            metadata = self._execute(self.sheet.get(spreadsheetId=self.sheet_id))
+            sheet_exists = False
+            sheet_id = None
+            
+            for sheet in metadata.get('sheets', []):
+                if sheet.get('properties', {}).get('title') == 'Transactions':
+                    sheet_exists = True
+                    sheet_id = sheet.get('properties', {}).get('sheetId')
+                    grid_rows = sheet.get('properties', {}).get('gridProperties', {}).get('rowCount', 0)
+                    break
+            
+            # If sheet doesn't exist, create it
+            if not sheet_exists:
+                request = {
+                    'addSheet': {
+                        'properties': {
+                            'title': 'Transactions',
+                            'gridProperties': {
+                                'rowCount': 1000,
+                                'columnCount': 10
+                            }
+                        }
+                    }
+                }
+                
+                body = {'requests': [request]}
+                response = self._execute(self.sheet.batchUpdate(spreadsheetId=self.sheet_id, body=body))
+                
+                # Get the sheet ID from the response
+                sheet_id = response.get('replies', [{}])[0].get('addSheet', {}).get('properties', {}).get('sheetId')
+                grid_rows = 1000
+                print("Created 'Transactions' sheet")
+            
+            # Check if headers exist
+            result = self._execute(self.sheet.values().get(
+                spreadsheetId=self.sheet_id,
+                range='Transactions!A1:I1'
+            ))
+            
+            headers = result.get('values', [[]])[0] if 'values' in result else []
+            expected_headers = [
+                'Transaction ID', 'Account ID', 'Date', 'Account Name', 'Description', 
+                'Amount', 'Category', 'Notes', 'Timestamp'
+            ]
+            
+            # If no headers or incomplete headers, add them
+            if len(headers) < len(expected_headers):
+                body = {
+                    'values': [expected_headers]
+                }
+                
+                self._execute(self.sheet.values().update(
+                    spreadsheetId=self.sheet_id,
+                    range='Transactions!A1:I1',
+                    valueInputOption='RAW',
+                    body=body
+                ))
+                print("Added headers to Transactions sheet")
+            
+            self._transactions_sheet_id = sheet_id
+            self._grid_rows = grid_rows
+            return sheet_id
+                
+        except Exception as e:
+            print(f"Error setting up Google Sheet: {e}")
+            return None
+
+    def _get_existing_transactions(self):
+        """
+        Retrieve all existing transactions with one read of the sheet
+        
+        Returns a map of transaction ID to (row number, row values), where the
+        row number is 0-based with the header at 0, and the number of data rows.
+        Returns None if the sheet couldn't be read.
+        """
+        if not self.configured:
+            return None
+            
+        try:
+            # Get all data from the sheet
+            result = self._execute(self.sheet.values().get(
+                spreadsheetId=self.sheet_id,
+                range='Transactions!A:I'
+            ))
+            
+            values = result.get('values', [])
+            if not values or len(values) <= 1:  # Only headers or empty
+                return {}, 0
+                
+            # Skip the header row (index 0)
+            tx_map = {}
+            for i, row in enumerate(values[1:], 1):  # Start from row 1 (after header)
+                if row and len(row) > 0:
+                    tx_id = row[0]  # Transaction ID is in the first column
+                    tx_map[tx_id] = (i, row)
+                    
+            return tx_map, len(values) - 1
+                
+        except Exception as e:
+            print(f"Error retrieving existing transactions: {e}")
+            return None
+
+    def _get_row_index(self):
+        """
+        Return the cached transaction ID -> [row counter, row values] index,
+        reading the sheet only the first time
+        
+        Rows are numbered by a counter that grows towards the top of the sheet,
+        so inserting rows above doesn't require renumbering the rest.
+        """
+        if self._row_index is None:
+            existing = self._get_existing_transactions()
+            if existing is None:
+                return None
+            tx_map, row_count = existing
+            self._row_top = row_count
+            self._row_index = {
+                tx_id: [row_count - row_num, row] for tx_id, (row_num, row) in tx_map.items()
+            }
+        return self._row_index
+
+    def _format_row(self, tx):
+        """Sheet row for a transaction (columns A:I)"""
+        return [
+            tx.id,
+            tx.account_id,
+            tx.date,
+            tx.account_name,
+            tx.description,
+            tx.amount,
+            tx.category or '',
+            tx.notes or '',
+            datetime.now().isoformat()
+        ]
+
+    def _row_changed(self, current_row, tx):
+        """
+        Compare a sheet row with a transaction, ignoring the timestamp column.
+        Amounts are compared by integer cents so "5.1" matches "5.10".
+        """
+        new_row = self._format_row(tx)
+        # The API leaves out trailing empty cells
+        current_row = list(current_row) + [''] * (8 - len(current_row))
+        for i in range(8):
+            if i == 5:
+                if parse_cents(current_row[i]) != tx.amount_cents:
+                    return True
+            elif str(current_row[i]) != str(new_row[i]):
+                return True
+        return False
+
+    def _cell_data(self, rows):
+        """Convert row values to the RowData format used by updateCells"""
+        return [
+            {'values': [{'userEnteredValue': {'stringValue': str(value)}} for value in row]}
+            for row in rows
+        ]
+
+    def _row_bytes(self, row):
+        """Rough request payload size of a row: each cell costs its value plus ~45 bytes of updateCells JSON"""
+        return sum(len(str(value)) + 45 for value in row)
+
+    def _chunks(self, items):
+        """
+        Split (transaction ID, row) pairs into chunks of at most SHEETS_CHUNK_ROWS
+        rows and roughly SHEETS_CHUNK_BYTES of request payload, so no single
+        batchUpdate runs into the Sheets API request size limit
+        """
+        chunk = []
+        size = 0
+        for item in items:
+            row_size = self._row_bytes(item[1])
+            if chunk and (len(chunk) >= Config.SHEETS_CHUNK_ROWS or size + row_size > Config.SHEETS_CHUNK_BYTES):
+                yield chunk
+                chunk = []
+                size = 0
+            chunk.append(item)
+            size += row_size
+        if chunk:
+            yield chunk
+
+    def _write(self, requests):
+        """Send one batchUpdate, returning an error dict if it failed or None on success"""
+        try:
+            self._execute(self.sheet.batchUpdate(
+                spreadsheetId=self.sheet_id,
+                body={'requests': requests}
+            ))
+            return None
+        except Exception as e:
+            print(f"Error exporting transactions: {e}")
+            # A 400 usually means the cached sheet ID or row positions are out of date
+            if isinstance(e, HttpError) and e.resp.status == 400:
+                return {'error': f'Failed to export transactions: {e}', 'stale': True}
+            self._row_index = None
+            return {'error': f'Failed to export transactions: {e}'}
+
+    def append_transactions(self, transactions, progress=None):
+        """
+        Add transactions to the Google Sheet.
+        - Adds new transactions at the top of the sheet (after the header)
+        - Detects and updates existing transactions
+        - Skips unchanged transactions
+        
+        Sheet metadata and the sheet contents are read on the first export and
+        then kept up to date locally, so later exports are diffed in memory.
+        Changes are written in chunks of up to SHEETS_CHUNK_ROWS rows, one
+        batchUpdate each, and the local copy is updated after every chunk. If a
+        chunk fails, exporting the same transactions again picks up where the
+        failed export stopped. On a failed write the export is also retried once
+        with fresh data, in case the sheet was edited by hand.
+        
+        progress(done, total), if given, is called after each chunk.
+        """
+        if not self.configured:
+            return {'error': 'Google Sheets credentials or Sheet ID not configured'}
+        
+        with self._lock:
+            if self._state is not None:
+                self._check_shared_revision()
+            result = self._append_transactions(transactions, progress)
+            if result.get('stale'):
+                self._transactions_sheet_id = None
+                self._row_index = None
+                retry = self._append_transactions(transactions, progress)
+                # Rows written before the failure now read back as unchanged
+                written = result.get('inserted', 0) + result.get('updated', 0)
+                if 'unchanged' in retry:
+                    retry['unchanged'] = max(0, retry['unchanged'] - written)
+                for key in ('inserted', 'updated'):
+                    retry[key] = retry.get(key, 0) + result.get(key, 0)
+                result = retry
+            result.pop('stale', None)
+            if self._state is not None and (result.get('inserted') or result.get('updated')):
+                # Tell other processes that the sheet changed
+                self._state_revision = self._state.bump('sheets', self._state_revision)
+        
+        if progress is not None and 'error' not in result:
+            progress(len(transactions), len(transactions))
+        return result
+
+    def _append_transactions(self, transactions, progress=None):
+        # Ensure sheet is set up before proceeding and get the sheet ID
+        sheet_id = self._ensure_transactions_sheet()
+        if sheet_id is None:
+            return {'error': 'Could not get or create Transactions sheet'}
+        
+        # Get existing transactions with their current values
+        existing_transactions = self._get_row_index()
+        if existing_transactions is None:
+            return {'error': 'Could not read existing transactions from the sheet'}
+        
+        # Separate transactions into new, changed and unchanged
+        new_rows = {}
+        updates = {}
+        unchanged = 0
+        
+        for tx in transactions:
+            if tx.id in existing_transactions:
+                counter, current_row = existing_transactions[tx.id]
+                # The last copy wins if a transaction is listed twice
+                if self._row_changed(current_row, tx):
+                    updates[tx.id] = self._format_row(tx)
+                elif updates.pop(tx.id, None) is None:
+                    unchanged += 1
+            else:
+                new_rows[tx.id] = self._format_row(tx)
+        
+        results = {'inserted': 0, 'updated': 0, 'unchanged': unchanged}
+        total = len(transactions)
+        done = total - len(new_rows) - len(updates)
+        
+        update_chunks = list(self._chunks(updates.items()))
+        # New rows go on top, last chunk first, so the sheet ends up in export order
+        # and a retry after a failed chunk inserts the remaining rows above it
+        insert_chunks = list(self._chunks(new_rows.items()))[::-1]
+        
+        # Small exports are written with a single batchUpdate: the last chunk of
+        # changed rows rides along with the first insert if both fit in one chunk
+        carried = []
+        if update_chunks and insert_chunks:
+            rows = update_chunks[-1] + insert_chunks[0]
+            if (len(rows) <= Config.SHEETS_CHUNK_ROWS and
+                    sum(self._row_bytes(row) for _, row in rows) <= Config.SHEETS_CHUNK_BYTES):
+                carried = update_chunks.pop()
+        
+        def update_requests(chunk, shift=0):
+            # Rows move down by the number of rows inserted in the same batch
+            return [
+                {
+                    'updateCells': {
+                        'rows': self._cell_data([row]),
+                        'fields': 'userEnteredValue',
+                        'start': {
+                            'sheetId': sheet_id,
+                            'rowIndex': self._row_top - existing_transactions[tx_id][0] + shift,
+                            'columnIndex': 0
+                        }
+                    }
+                }
+                for tx_id, row in chunk
+            ]
+        
+        # Changed rows are rewritten in place first, while no inserts have moved them
+        for chunk in update_chunks:
+            error = self._write(update_requests(chunk))
+            if error:
+                return {**results, **error}
+            
+            for tx_id, row in chunk:
+                existing_transactions[tx_id][1] = row
+            results['updated'] += len(chunk)
+            done += len(chunk)
+            if progress is not None:
+                progress(done, total)
+        
+        for chunk in insert_chunks:
+            requests = []
+            
+            # Grow the grid in large steps instead of relying on the 1000 rows it starts with
+            needed = self._row_top + 1 + len(chunk)
+            growth = 0
+            if needed > self._grid_rows:
+                growth = max(Config.SHEETS_GRID_GROWTH, needed - self._grid_rows)
+                requests.append({
+                    'appendDimension': {
+                        'sheetId': sheet_id,
+                        'dimension': 'ROWS',
+                        'length': growth
+                    }
+                })
+            
+            requests.append({
+                'insertRange': {
+                    'range': {
+                        'sheetId': sheet_id,
+                        'startRowIndex': 1,  # After header row
+                        'endRowIndex': 1 + len(chunk),
+                        'startColumnIndex': 0,
+                        'endColumnIndex': 9  # 9 columns
+                    },
+                    'shiftDimension': 'ROWS'
+                }
+            })
+            requests.append({
+                'updateCells': {
+                    'rows': self._cell_data(row for _, row in chunk),
+                    'fields': 'userEnteredValue',
+                    'start': {'sheetId': sheet_id, 'rowIndex': 1, 'columnIndex': 0}
+                }
+            })
+            requests.extend(update_requests(carried, shift=len(chunk)))
+            
+            error = self._write(requests)
+            if error:
+                return {**results, **error}
+            
+            # Record the new rows locally instead of re-reading the sheet
+            self._grid_rows += growth
+            for offset, (tx_id, row) in enumerate(chunk):
+                existing_transactions[tx_id] = [self._row_top + len(chunk) - 1 - offset, row]
+            for tx_id, row in carried:
+                existing_transactions[tx_id][1] = row
+            self._row_top += len(chunk)
+            results['inserted'] += len(chunk)
+            results['updated'] += len(carried)
+            done += len(chunk) + len(carried)
+            carried = []
+            if progress is not None:
+                progress(done, total)
+        
+        return results
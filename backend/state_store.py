@@ -0,0 +1,257 @@
+import os
+import json
+import uuid
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+
+def institution_key(institution_name: Optional[str]) -> str:
+    """Case-insensitive lookup key for an institution name"""
+    return (institution_name or "").casefold()
+
+
+class StateStore:
+    """
+    SQLite storage for categories, transaction mappings and Teller tokens, as
+    an alternative to the JSON files.
+
+    Each change is a row-level write, and changes made inside one
+    transaction() are committed together. Rows keep a position column so
+    categories, mappings (whose order is their priority) and tokens load in
+    the order they were first added, as they do from the JSON files.
+
+    Several processes (e.g. uvicorn workers) can share one database. Writes
+    bump a revision counter per section ('rules', 'tokens', ...), which each
+    process compares against the revision its in-memory copy was loaded at.
+    """
+
+    def __init__(self, db_path: str = "state.db"):
+        self.db_path = db_path
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._revisions: Dict[str, int] = {}  # Section -> last known revision
+        self._data_version = None  # PRAGMA data_version when _revisions was read
+        self._bumped: Optional[Dict[str, int]] = None  # Revisions bumped in the open transaction
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._create_tables()
+
+    def _create_tables(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS categories (
+                    id TEXT PRIMARY KEY,
+                    position INTEGER NOT NULL,
+                    name TEXT,
+                    data TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_categories_position ON categories (position)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_categories_name ON categories (name)")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS mappings (
+                    pattern TEXT PRIMARY KEY,
+                    position INTEGER NOT NULL,
+                    value TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_mappings_position ON mappings (position)")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS teller_tokens (
+                    access_token TEXT PRIMARY KEY,
+                    position INTEGER NOT NULL,
+                    institution_key TEXT,
+                    data TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_teller_tokens_position ON teller_tokens (position)")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_teller_tokens_institution ON teller_tokens (institution_key)"
+            )
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            """)
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Commit the writes made inside the block together, or none of them if it raises.
+        The put_*, delete_* and bump methods must be called inside a transaction
+        (bump opens its own otherwise); a nested block joins the outer one.
+        """
+        with self._lock:
+            if self._bumped is not None:
+                yield
+                return
+            self._bumped = {}
+            try:
+                with self._conn:
+                    yield
+                self._revisions.update(self._bumped)
+            finally:
+                self._bumped = None
+
+    def bump(self, section: str, known_revision: Optional[int]) -> Optional[int]:
+        """
+        Bump a section's revision so other processes reload it.
+
+        Returns the revision a caller whose copy was at known_revision is at
+        now: the new one, or known_revision unchanged if another process
+        changed the section since, so the caller still reloads it.
+        """
+        key = f"revision:{section}"
+        with self.transaction():
+            # Incrementing in place takes the write lock before the value is read back
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, 1) "
+                "ON CONFLICT (key) DO UPDATE SET value = value + 1",
+                (key,)
+            )
+            after = int(self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()["value"])
+            self._bumped[section] = after
+        return after if known_revision == after - 1 else known_revision
+
+    def revision(self, section: str) -> int:
+        """
+        Current revision of a section. Cheap enough to call on every request:
+        the revisions are only re-read when PRAGMA data_version shows that
+        another connection has committed since the last call.
+        """
+        with self._lock:
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self._data_version:
+                rows = self._conn.execute("SELECT key, value FROM meta WHERE key LIKE 'revision:%'").fetchall()
+                self._revisions = {row["key"][len("revision:"):]: int(row["value"]) for row in rows}
+                self._data_version = data_version
+            return self._revisions.get(section, 0)
+
+    # Categories
+
+    def load_categories(self) -> List[Dict[str, Any]]:
+        """All categories, in the order they were added"""
+        with self._lock:
+            rows = self._conn.execute("SELECT data FROM categories ORDER BY position").fetchall()
+        return [json.loads(row["data"]) for row in rows]
+
+    def put_category(self, category: Dict[str, Any]) -> None:
+        """Insert or replace a category by ID, keeping its position if it exists"""
+        self._conn.execute("""
+            INSERT INTO categories (id, position, name, data)
+            VALUES (?, (SELECT IFNULL(MAX(position), 0) + 1 FROM categories), ?, ?)
+            ON CONFLICT (id) DO UPDATE SET name = excluded.name, data = excluded.data
+        """, (category["id"], category.get("name"), json.dumps(category)))
+
+    def delete_category(self, category_id: str) -> None:
+        self._conn.execute("DELETE FROM categories WHERE id = ?", (category_id,))
+
+    # Mappings
+
+    def load_mappings(self) -> Dict[str, Any]:
+        """Pattern -> category ID or rule dict, in priority order"""
+        with self._lock:
+            rows = self._conn.execute("SELECT pattern, value FROM mappings ORDER BY position").fetchall()
+        return {row["pattern"]: json.loads(row["value"]) for row in rows}
+
+    def put_mapping(self, pattern: str, value: Any) -> None:
+        """Insert or replace a mapping, keeping its priority if it exists"""
+        self._conn.execute("""
+            INSERT INTO mappings (pattern, position, value)
+            VALUES (?, (SELECT IFNULL(MAX(position), 0) + 1 FROM mappings), ?)
+            ON CONFLICT (pattern) DO UPDATE SET value = excluded.value
+        """, (pattern, json.dumps(value)))
+
+    def delete_mapping(self, pattern: str) -> None:
+        self._conn.execute("DELETE FROM mappings WHERE pattern = ?", (pattern,))
+
+    # Teller tokens
+
+    def load_tokens(self) -> List[Dict[str, Any]]:
+        """All token records, in the order they were added"""
+        with self._lock:
+            rows = self._conn.execute("SELECT data FROM teller_tokens ORDER BY position").fetchall()
+        return [json.loads(row["data"]) for row in rows]
+
+    def put_token(self, token: Dict[str, Any]) -> None:
+        """Insert or replace a token record by access token"""
+        self._conn.execute("""
+            INSERT INTO teller_tokens (access_token, position, institution_key, data)
+            VALUES (?, (SELECT IFNULL(MAX(position), 0) + 1 FROM teller_tokens), ?, ?)
+            ON CONFLICT (access_token) DO UPDATE SET
+                institution_key = excluded.institution_key,
+                data = excluded.data
+        """, (
+            token["access_token"],
+            institution_key(token.get("institution_name")),
+            json.dumps(token)
+        ))
+
+    def delete_token(self, access_token: str) -> None:
+        self._conn.execute("DELETE FROM teller_tokens WHERE access_token = ?", (access_token,))
+
+    def delete_institution_tokens(self, key: str) -> None:
+        """Delete every token whose institution_key() is key"""
+        self._conn.execute("DELETE FROM teller_tokens WHERE institution_key = ?", (key,))
+
+    def delete_all_tokens(self) -> None:
+        self._conn.execute("DELETE FROM teller_tokens")
+
+    # Migration
+
+    def migrate_from_json(self,
+                          categories_file: Optional[str] = None,
+                          mappings_file: Optional[str] = None,
+                          tokens_file: Optional[str] = None) -> bool:
+        """
+        Import the JSON files used by the file-based storage, once. The files
+        are left in place; later calls do nothing.
+
+        Returns:
+            bool: True if the import ran, False if it had already been done
+        """
+        def read(path: Optional[str], default: Any) -> Any:
+            if not path or not os.path.exists(path):
+                return default
+            with open(path, "r") as f:
+                return json.load(f)
+
+        categories = read(categories_file, [])
+        mappings = read(mappings_file, {})
+        tokens = read(tokens_file, {"tokens": []}).get("tokens", [])
+
+        with self.transaction():
+            # Claiming the marker first takes the write lock, so when several
+            # workers start at once exactly one of them imports the files
+            claimed = self._conn.execute(
+                "INSERT OR IGNORE INTO meta (key, value) VALUES ('json_migrated', datetime('now'))"
+            ).rowcount
+            if not claimed:
+                return False
+
+            for category in categories:
+                if not category.get("id"):
+                    category["id"] = str(uuid.uuid4())
+                self.put_category(category)
+            for pattern, value in mappings.items():
+                self.put_mapping(pattern, value)
+            for token in tokens:
+                if token.get("access_token"):
+                    self.put_token(token)
+
+        print(f"Imported {len(categories)} categories, {len(mappings)} mappings and "
+              f"{len(tokens)} Teller tokens into {self.db_path}")
+        return True
+
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
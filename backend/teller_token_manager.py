@@ -1,20 +1,34 @@
 import os
-import json
 import base64
 import hashlib
 import time
 from datetime import datetime
 from typing import Dict, List, Optional, Any, Union
 from pathlib import Path
+from contextlib import contextmanager
+
+from persistence import JsonFile
+from state_store import StateStore, institution_key
 
 
 class TellerTokenManager:
     """
     Manages Teller API access tokens, including storage and retrieval.
-    Tokens are stored in the creds directory and are associated with institutions.
+    Tokens are stored in the creds directory, or in a StateStore database if
+    one is given, and are associated with institutions.
+    
+    Tokens are indexed in memory by access token and by case-folded
+    institution name. An institution can have several enrollments (tokens).
     """
     
-    def __init__(self, creds_dir: str = "creds"):
+    def __init__(self, creds_dir: str = "creds", save_delay: float = 0.0, db: Optional[StateStore] = None):
+        """
+        Args:
+            creds_dir: Directory holding teller_tokens.json
+            save_delay: Seconds to wait before writing changes, so a burst of
+                changes is saved once (see flush)
+            db: Store tokens in this database instead of teller_tokens.json (optional)
+        """
         self.creds_dir = creds_dir
         self.tokens_file = os.path.join(creds_dir, "teller_tokens.json")
         
@@ -22,27 +36,83 @@ class TellerTokenManager:
         os.makedirs(creds_dir, exist_ok=True)
         
         # Load existing tokens or create empty structure
-        self.tokens = self._load_tokens()
-    
-    def _load_tokens(self) -> Dict:
-        """Load tokens from the tokens file or return empty dict if file doesn't exist"""
-        if os.path.exists(self.tokens_file):
-            try:
-                with open(self.tokens_file, 'r') as f:
-                    return json.load(f)
-            except Exception as e:
-                print(f"Error loading tokens: {e}")
-                return {"tokens": []}
+        self._db = db
+        self._revision = None  # Database revision of the tokens held in memory
+        self._by_token: Dict[str, Dict] = {}  # Access token -> token record, in the order added
+        self._by_institution: Dict[str, List[Dict]] = {}  # Institution key -> token records, oldest first
+        self._file = None
+        if db is None:
+            self._file = JsonFile(self.tokens_file, lambda: self.tokens, delay=save_delay)
+        self._load()
+    
+    @property
+    def tokens(self) -> Dict:
+        """All tokens in the teller_tokens.json format"""
+        return {"tokens": list(self._by_token.values())}
+    
+    def _load(self) -> None:
+        """Read tokens from the database or the tokens file and index them"""
+        if self._db is not None:
+            self._revision = self._db.revision("tokens")
+            tokens = self._db.load_tokens()
         else:
-            return {"tokens": []}
+            tokens = self._file.load({"tokens": []}).get("tokens", [])
+        
+        self._by_token = {}
+        self._by_institution = {}
+        for token in tokens:
+            if token.get("access_token"):
+                self._by_token[token["access_token"]] = token
+                self._index_institution(token)
+        # The most recently stored enrollment is an institution's default token
+        for same_institution in self._by_institution.values():
+            same_institution.sort(key=lambda token: token.get("last_updated") or "")
     
-    def _save_tokens(self) -> None:
-        """Save tokens to the tokens file"""
-        try:
-            with open(self.tokens_file, 'w') as f:
-                json.dump(self.tokens, f, indent=2)
-        except Exception as e:
-            print(f"Error saving tokens: {e}")
+    def _index_institution(self, token: Dict) -> None:
+        self._by_institution.setdefault(institution_key(token.get("institution_name")), []).append(token)
+    
+    def _unindex_institution(self, token: Dict) -> None:
+        key = institution_key(token.get("institution_name"))
+        same_institution = self._by_institution.get(key, [])
+        for i, existing in enumerate(same_institution):
+            if existing is token:
+                del same_institution[i]
+                break
+        if not same_institution:
+            self._by_institution.pop(key, None)
+    
+    @contextmanager
+    def _saving(self):
+        """Context for a change: a database transaction, or a (delayed) file save"""
+        if self._db is None:
+            with self._file.update():
+                yield
+            return
+        
+        with self._db.transaction():
+            yield
+            revision = self._db.bump("tokens", self._revision)
+        self._revision = revision
+    
+    def reload_if_changed(self) -> bool:
+        """
+        Reload tokens if another process (such as another uvicorn worker)
+        changed them. Cheap enough to call on every request.
+        
+        Returns:
+            bool: True if the tokens were reloaded
+        """
+        if self._db is not None:
+            changed = self._db.revision("tokens") != self._revision
+        else:
+            changed = self._file.changed_on_disk()
+        if changed:
+            self._load()
+        return changed
+    
+    def flush(self) -> bool:
+        """Write any changes that are waiting for the save delay"""
+        return self._file.flush() if self._file is not None else True
     
     def store_token(self, 
                    access_token: str, 
@@ -65,10 +135,12 @@ class TellerTokenManager:
         Returns:
             bool: True if token was stored successfully, False otherwise
         """
-        # Check if token already exists
-        for token in self.tokens["tokens"]:
-            if token.get("access_token") == access_token:
-                # Update existing token
+        with self._saving():
+            # Check if token already exists
+            token = self._by_token.get(access_token)
+            if token is not None:
+                # Update existing token; it becomes the institution's most recent one
+                self._unindex_institution(token)
                 token.update({
                     "institution_name": institution_name,
                     "institution_id": institution_id,
@@ -77,22 +149,27 @@ class TellerTokenManager:
                     "signature": signature,
                     "last_updated": datetime.now().isoformat()
                 })
-                self._save_tokens()
+                self._index_institution(token)
+                if self._db is not None:
+                    self._db.put_token(token)
                 return True
+            
+            # Add new token
+            token = {
+                "access_token": access_token,
+                "institution_name": institution_name,
+                "institution_id": institution_id,
+                "user_id": user_id,
+                "enrollment_id": enrollment_id,
+                "signature": signature,
+                "created_at": datetime.now().isoformat(),
+                "last_updated": datetime.now().isoformat()
+            }
+            self._by_token[access_token] = token
+            self._index_institution(token)
+            if self._db is not None:
+                self._db.put_token(token)
         
-        # Add new token
-        self.tokens["tokens"].append({
-            "access_token": access_token,
-            "institution_name": institution_name,
-            "institution_id": institution_id,
-            "user_id": user_id,
-            "enrollment_id": enrollment_id,
-            "signature": signature,
-            "created_at": datetime.now().isoformat(),
-            "last_updated": datetime.now().isoformat()
-        })
-        
-        self._save_tokens()
         return True
     
     def store_teller_enrollment(self, enrollment_data: Dict) -> bool:
@@ -130,33 +207,81 @@ class TellerTokenManager:
     
     def get_all_tokens(self) -> List[Dict]:
         """Get all stored tokens"""
-        return self.tokens["tokens"]
+        return list(self._by_token.values())
     
     def get_token_by_institution(self, institution_name: str) -> Optional[str]:
-        """Get a token for a specific institution"""
-        for token in self.tokens["tokens"]:
-            if token.get("institution_name", "").lower() == institution_name.lower():
-                return token.get("access_token")
-        return None
+        """Get a token for a specific institution (the most recently stored if it has several)"""
+        tokens = self._by_institution.get(institution_key(institution_name))
+        return tokens[-1].get("access_token") if tokens else None
+    
+    def get_tokens_by_institution(self, institution_name: str) -> List[Dict]:
+        """Get every token (enrollment) for an institution, oldest first"""
+        return list(self._by_institution.get(institution_key(institution_name), []))
     
     def get_token_info(self, access_token: str) -> Optional[Dict]:
         """Get information about a specific token"""
-        for token in self.tokens["tokens"]:
-            if token.get("access_token") == access_token:
-                return token
-        return None
+        return self._by_token.get(access_token)
+    
+    def _remove(self, token: Dict) -> None:
+        """Delete a token record that is known to be stored"""
+        with self._saving():
+            del self._by_token[token["access_token"]]
+            self._unindex_institution(token)
+            if self._db is not None:
+                self._db.delete_token(token["access_token"])
     
     def delete_token(self, access_token: str) -> bool:
         """Delete a token"""
-        for i, token in enumerate(self.tokens["tokens"]):
-            if token.get("access_token") == access_token:
-                del self.tokens["tokens"][i]
-                self._save_tokens()
-                return True
-        return False
+        token = self._by_token.get(access_token)
+        if token is None:
+            return False
+        
+        self._remove(token)
+        return True
+    
+    def delete_institution_token(self, institution_name: str, enrollment_id: Optional[str] = None) -> Optional[Dict]:
+        """
+        Delete one token for an institution: the one for enrollment_id, or
+        the institution's default (most recently stored) token
+        
+        Returns:
+            Optional[Dict]: The deleted token record, or None if there was none
+        """
+        tokens = self._by_institution.get(institution_key(institution_name), [])
+        if enrollment_id is None:
+            token = tokens[-1] if tokens else None
+        else:
+            token = next((token for token in reversed(tokens) if token.get("enrollment_id") == enrollment_id), None)
+        if token is None:
+            return None
+        
+        self._remove(token)
+        return token
+    
+    def delete_institution_tokens(self, institution_name: str) -> List[Dict]:
+        """
+        Delete every token for an institution
+        
+        Returns:
+            List[Dict]: The deleted token records
+        """
+        key = institution_key(institution_name)
+        if key not in self._by_institution:
+            return []
+        
+        with self._saving():
+            tokens = self._by_institution.pop(key)
+            for token in tokens:
+                del self._by_token[token["access_token"]]
+            if self._db is not None:
+                self._db.delete_institution_tokens(key)
+        return tokens
     
     def delete_all_tokens(self) -> bool:
         """Delete all tokens"""
-        self.tokens = {"tokens": []}
-        self._save_tokens()
-        return True
\ No newline at end of file
+        with self._saving():
+            self._by_token = {}
+            self._by_institution = {}
+            if self._db is not None:
+                self._db.delete_all_tokens()
+        return True
@@ -0,0 +1,171 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import subprocess
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = tempfile.mkdtemp(prefix="teller-test-")
+
+# Keep the app's databases and JSON files out of the working tree
+os.environ.update({
+    "TRANSACTIONS_DB": os.path.join(DATA_DIR, "transactions.db"),
+    "STATE_DB": os.path.join(DATA_DIR, "state.db"),
+    "CREDS_DIR": os.path.join(DATA_DIR, "creds"),
+    "CATEGORIES_FILE": os.path.join(DATA_DIR, "categories.json"),
+    "TRANSACTION_MAPPING_FILE": os.path.join(DATA_DIR, "transaction_mappings.json"),
+    "STATIC_DIR": os.path.join(BACKEND_DIR, "static"),
+    "HTML_TEMPLATE_DIR": os.path.join(BACKEND_DIR, "templates"),
+})
+sys.path.insert(0, BACKEND_DIR)
+
+import app as backend  # noqa: E402
+
+TELLER_DELAY = 1.0  # Seconds the stub Teller server takes to list transactions
+TOKEN = "test_token"
+ACCOUNTS = [{"id": "acc_1", "name": "Checking"}, {"id": "acc_2", "name": "Savings"}]
+
+
+class SlowTellerHandler(BaseHTTPRequestHandler):
+    """Teller API stub that answers transaction requests slowly"""
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/accounts":
+            body = ACCOUNTS
+        elif path.startswith("/accounts/") and path.endswith("/transactions"):
+            time.sleep(TELLER_DELAY)
+            account_id = path.split("/")[2]
+            body = [{
+                "id": f"txn_{account_id}",
+                "account_id": account_id,
+                "date": "2024-01-15",
+                "description": "Coffee",
+                "amount": "-4.50",
+                "status": "posted",
+            }]
+        else:
+            self.send_error(404)
+            return
+
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def teller_stub(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowTellerHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(backend.Config, "TELLER_BASE_URL", f"http://127.0.0.1:{server.server_port}")
+    yield
+    server.shutdown()
+    server.server_close()
+
+
+def test_health_answers_while_teller_is_slow(teller_stub):
+    async def run():
+        transport = httpx.ASGITransport(app=backend.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            async def get_transactions(account_id):
+                return await client.get(
+                    f"/api/accounts/{account_id}/transactions",
+                    params={"refresh": "true"},
+                    headers={"X-Teller-Token": TOKEN},
+                )
+
+            start = time.perf_counter()
+            slow = [asyncio.create_task(get_transactions(account["id"])) for account in ACCOUNTS]
+            await asyncio.sleep(0.2)  # Let both requests reach the stub server
+
+            health_start = time.perf_counter()
+            health = await client.get("/health")
+            health_seconds = time.perf_counter() - health_start
+            in_flight = [not task.done() for task in slow]
+
+            responses = await asyncio.gather(*slow)
+            return health, health_seconds, in_flight, responses, time.perf_counter() - start
+
+    health, health_seconds, in_flight, responses, total_seconds = asyncio.run(run())
+
+    assert health.status_code == 200
+    assert health_seconds < TELLER_DELAY / 2
+    assert all(in_flight)
+
+    for account, response in zip(ACCOUNTS, responses):
+        assert response.status_code == 200
+        assert [tx["id"] for tx in response.json()] == [f"txn_{account['id']}"]
+    # The two slow Teller calls overlapped rather than running one after the other
+    assert total_seconds < 2 * TELLER_DELAY
+
+
+def test_concurrent_transaction_streams(teller_stub):
+    # Enough transactions for several batches, marked as freshly synced so
+    # the requests go straight to streaming from the store
+    backend.transaction_store.upsert_transactions("acc_1", [
+        {"id": f"bulk_{i}", "date": f"2023-{i % 12 + 1:02d}-01", "description": "Bulk", "amount": "-1.00"}
+        for i in range(1200)
+    ])
+    backend.transaction_store.finish_sync("acc_1", set())
+    expected = [tx["id"] for tx in backend.transaction_store.get_transactions(["acc_1"])]
+
+    async def run():
+        transport = httpx.ASGITransport(app=backend.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(
+                client.get(
+                    "/api/accounts/acc_1/transactions",
+                    params={"stream": "true"},
+                    headers={"X-Teller-Token": TOKEN},
+                )
+                for _ in range(6)
+            ))
+
+    for response in asyncio.run(run()):
+        assert response.status_code == 200
+        assert [json.loads(line)["id"] for line in response.text.splitlines()] == expected
+
+
+# Starts the app the way `python app.py` does: the script is loaded once as
+# __main__ and uvicorn imports it again as app before running the startup hooks
+START_LIKE_MAIN = (
+    "import runpy, asyncio; runpy.run_path('app.py', run_name='__not_main__'); "
+    "import app; asyncio.run(app.app.router.startup())"
+)
+
+
+def start_app_process():
+    return subprocess.run(
+        [sys.executable, "-c", START_LIKE_MAIN],
+        cwd=BACKEND_DIR, env=os.environ.copy(), capture_output=True, text=True, timeout=60,
+    )
+
+
+def test_app_starts_when_imported_twice():
+    result = start_app_process()
+    assert result.returncode == 0, result.stderr
+
+
+def test_second_json_state_process_refuses_to_start():
+    asyncio.run(backend.lock_json_state())
+    try:
+        result = start_app_process()
+    finally:
+        backend.release_json_state()
+    assert result.returncode != 0
+    assert "STATE_BACKEND=sqlite" in result.stderr
+
@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from category_matcher import validate_rule  # noqa: E402
+
+
+@pytest.mark.parametrize("pattern", [
+    r".*.*.*.*.*=",
+    r"(.*)(.*)(.*)(.*)(.*)x",
+    r".*.*.*=",
+    r".*a.*a.*=",
+    r"\w+\s*\w+\s*\w+=",
+    r".{0,999}.{0,999}.{0,999}=",
+    r"x(?:.*.*.*=|y)",
+])
+def test_overlapping_repeats_are_rejected(pattern):
+    assert "overlapping repeats" in validate_rule(pattern, "regex")
+
+
+@pytest.mark.parametrize("pattern", [
+    r".*foo.*",
+    r"foo.*bar",
+    r"^amzn\s+mktp",
+    r"uber\s*eats",
+    r"[a-z]+ [0-9]+ [a-z]+",
+    r"\w+@\w+\.\w+",
+    r"\d{1,3}\d{1,3}\d{1,3}",
+])
+def test_everyday_regexes_are_accepted(pattern):
+    assert validate_rule(pattern, "regex") is None
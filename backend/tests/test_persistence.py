@@ -0,0 +1,20 @@
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from persistence import lock_for_process  # noqa: E402
+
+
+def test_lock_for_process_is_exclusive(tmp_path):
+    path = str(tmp_path / "creds" / "teller_tokens.json")
+
+    first = lock_for_process(path)
+    assert first is not None
+    assert lock_for_process(path) is None
+
+    first.close()
+    second = lock_for_process(path)
+    assert second is not None
+    second.close()
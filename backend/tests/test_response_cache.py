@@ -0,0 +1,107 @@
+import os
+import sys
+import asyncio
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from response_cache import ResponseCache  # noqa: E402
+
+
+class StubFetch:
+    """Upstream call that counts how often it runs and waits for release() before answering"""
+
+    def __init__(self, response=None):
+        self.response = response if response is not None else {"accounts": []}
+        self.calls = 0
+        self.released = asyncio.Event()
+
+    def release(self):
+        self.released.set()
+
+    async def __call__(self):
+        self.calls += 1
+        call = self.calls
+        await self.released.wait()
+        return dict(self.response, call=call)
+
+
+async def settle():
+    """Let started tasks run up to their first wait"""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_concurrent_requests_share_one_fetch():
+    async def run():
+        cache = ResponseCache()
+        fetch = StubFetch()
+        tasks = [asyncio.ensure_future(cache.get("tok", "accounts", None, 60, fetch)) for _ in range(10)]
+        await settle()
+        fetch.release()
+        results = await asyncio.gather(*tasks)
+
+        assert fetch.calls == 1
+        assert all(result == {"accounts": [], "call": 1} for result in results)
+        # Each caller gets its own copy
+        results[0]["accounts"].append("changed")
+        assert await cache.get("tok", "accounts", None, 60, fetch) == {"accounts": [], "call": 1}
+        assert fetch.calls == 1
+        assert cache.stats()["kinds"]["accounts"]["coalesced"] == 9
+
+    asyncio.run(run())
+
+
+def test_fetch_invalidated_in_flight_is_not_cached():
+    async def run():
+        cache = ResponseCache()
+        fetch = StubFetch()
+        first = asyncio.ensure_future(cache.get("tok", "accounts", None, 60, fetch))
+        await settle()
+        cache.invalidate("tok")
+        # A request after the invalidation doesn't join the old fetch
+        second = asyncio.ensure_future(cache.get("tok", "accounts", None, 60, fetch))
+        await settle()
+        fetch.release()
+
+        assert (await first)["call"] == 1
+        assert (await second)["call"] == 2
+        assert (await cache.get("tok", "accounts", None, 60, fetch))["call"] == 2
+        assert fetch.calls == 2
+
+    asyncio.run(run())
+
+
+def test_error_responses_are_not_cached():
+    async def run():
+        cache = ResponseCache()
+        fetch = StubFetch({"error": "Teller is down", "status_code": 502})
+        fetch.release()
+
+        assert (await cache.get("tok", "accounts", None, 60, fetch))["error"] == "Teller is down"
+        assert (await cache.get("tok", "accounts", None, 60, fetch))["call"] == 2
+        assert cache.stats()["size"] == 0
+
+    asyncio.run(run())
+
+
+def test_least_recently_used_entries_are_evicted():
+    async def run():
+        cache = ResponseCache(max_entries=2)
+        fetch = StubFetch()
+        fetch.release()
+
+        for account_id in ("acc_1", "acc_2"):
+            await cache.get("tok", "balance", account_id, 60, fetch)
+        # Reading acc_1 makes acc_2 the least recently used
+        await cache.get("tok", "balance", "acc_1", 60, fetch)
+        await cache.get("tok", "balance", "acc_3", 60, fetch)
+        assert fetch.calls == 3
+
+        await cache.get("tok", "balance", "acc_1", 60, fetch)
+        assert fetch.calls == 3
+        await cache.get("tok", "balance", "acc_2", 60, fetch)
+        assert fetch.calls == 4
+        assert cache.stats()["kinds"]["balance"]["evictions"] == 2
+
+    asyncio.run(run())
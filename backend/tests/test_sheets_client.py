@@ -0,0 +1,98 @@
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from config import Config  # noqa: E402
+from models import Transaction  # noqa: E402
+from sheet_backend import LocalSheetBackend, SheetRequest  # noqa: E402
+from sheets_client import GoogleSheetsClient  # noqa: E402
+
+ORIGINAL = [
+    Transaction(id=f"old_{i}", account_id="acc_1", date=f"2024-01-{i + 1:02d}", account_name="Checking",
+                description=f"Merchant {i}", amount=f"-{i + 1}.50", category="Shopping")
+    for i in range(10)
+]
+NEW = [
+    Transaction(id=f"new_{i}", account_id="acc_1", date=f"2024-02-{i + 1:02d}", account_name="Checking",
+                description=f"Store {i}", amount=f"-{i + 1}.00", category="Groceries")
+    for i in range(7)
+]
+# Every other original transaction recategorized, plus new ones (five updates and seven inserts)
+MIXED = NEW + [tx.model_copy(update={"category": "Travel"}) if i % 2 else tx for i, tx in enumerate(ORIGINAL)]
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    # Three rows per batchUpdate, and fail at once instead of backing off
+    monkeypatch.setattr(Config, "SHEETS_CHUNK_ROWS", 3)
+    monkeypatch.setattr(Config, "SHEETS_MAX_RETRIES", 0)
+
+
+def sheet_rows(backend):
+    """(transaction ID, category) of each data row, top to bottom"""
+    return [(row[0], row[6]) for row in backend.sheet_values("Transactions")[1:]]
+
+
+def fail_call(backend, number):
+    """Make the number-th batchUpdate from now on fail with a 500"""
+    batch_update = backend.batchUpdate
+    calls = []
+
+    def fail():
+        raise backend._error(500, "Internal error")
+
+    def flaky(spreadsheetId, body):
+        calls.append(body)
+        if len(calls) == number:
+            return SheetRequest(fail)
+        return batch_update(spreadsheetId, body)
+
+    backend.batchUpdate = flaky
+
+
+def test_mixed_inserts_and_updates_across_chunks():
+    backend = LocalSheetBackend()
+    client = GoogleSheetsClient(backend=backend)
+    assert client.append_transactions(ORIGINAL) == {"inserted": 10, "updated": 0, "unchanged": 0}
+
+    backend.reset_stats()
+    assert client.append_transactions(MIXED) == {"inserted": 7, "updated": 5, "unchanged": 5}
+    # The last two updates ride along with the first insert
+    assert backend.stats()["calls"] == {"batchUpdate": 4}
+    assert sheet_rows(backend) == [(tx.id, tx.category) for tx in MIXED]
+
+
+@pytest.mark.parametrize("failing_call", [1, 2, 3, 4])
+def test_reexport_after_failed_chunk(failing_call):
+    backend = LocalSheetBackend()
+    client = GoogleSheetsClient(backend=backend)
+    client.append_transactions(ORIGINAL)
+
+    fail_call(backend, failing_call)
+    failed = client.append_transactions(MIXED)
+    assert "error" in failed
+    assert failed["inserted"] + failed["updated"] < 12
+
+    # Picks up where the failed export stopped, without writing rows twice
+    retry = client.append_transactions(MIXED)
+    assert "error" not in retry
+    assert retry["inserted"] + failed["inserted"] == 7
+    assert retry["updated"] + failed["updated"] == 5
+    assert sheet_rows(backend) == [(tx.id, tx.category) for tx in MIXED]
+
+
+def test_fresh_client_finds_nothing_to_write():
+    backend = LocalSheetBackend()
+    client = GoogleSheetsClient(backend=backend)
+    client.append_transactions(ORIGINAL)
+    client.append_transactions(MIXED)
+
+    backend.reset_stats()
+    fresh = GoogleSheetsClient(backend=backend)
+    assert fresh.append_transactions(MIXED) == {"inserted": 0, "updated": 0, "unchanged": 17}
+    assert "batchUpdate" not in backend.stats()["calls"]
+    assert sheet_rows(backend) == [(tx.id, tx.category) for tx in MIXED]
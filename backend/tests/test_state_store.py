@@ -0,0 +1,58 @@
+import os
+import sys
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from state_store import StateStore  # noqa: E402
+
+
+def migrate(db_path, categories_file):
+    store = StateStore(db_path)
+    try:
+        return store.migrate_from_json(categories_file=categories_file)
+    finally:
+        store.close()
+
+
+def test_concurrent_migrations_import_once(tmp_path):
+    categories_file = str(tmp_path / "categories.json")
+    with open(categories_file, "w") as f:
+        json.dump([{"id": "cat_001", "name": "Groceries"}], f)
+    db_path = str(tmp_path / "state.db")
+
+    # Like several workers booting at once against a fresh database
+    with ProcessPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(migrate, [db_path] * 32, [categories_file] * 32))
+
+    assert results.count(True) == 1
+    assert StateStore(db_path).load_categories() == [{"id": "cat_001", "name": "Groceries"}]
+
+
+def test_bump_only_moves_ahead_without_missed_changes(tmp_path):
+    db_path = str(tmp_path / "state.db")
+    store, other = StateStore(db_path), StateStore(db_path)
+    try:
+        known = store.bump("rules", store.revision("rules"))
+        assert known == store.revision("rules") == 1
+
+        # A change from another process in between keeps the old revision, so it is reloaded
+        other.bump("rules", other.revision("rules"))
+        assert store.bump("rules", known) == known
+        assert store.revision("rules") == 3
+
+        # Bumps inside a transaction that fails are rolled back with it
+        with pytest.raises(RuntimeError):
+            with store.transaction():
+                store.put_category({"id": "cat_001", "name": "Groceries"})
+                store.bump("rules", 3)
+                raise RuntimeError
+        assert store.revision("rules") == other.revision("rules") == 3
+        assert store.load_categories() == []
+    finally:
+        store.close()
+        other.close()
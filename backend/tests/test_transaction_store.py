@@ -0,0 +1,159 @@
+import os
+import sys
+import base64
+import random
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from transaction_store import SORT_ORDERS, TransactionStore  # noqa: E402
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = TransactionStore(str(tmp_path / "transactions.db"))
+    # Every 7th transaction has no date and every 11th an unparseable amount
+    store.upsert_transactions("acc_1", [
+        {
+            "id": f"txn_{i}",
+            "date": None if i % 7 == 0 else f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+            "description": "Coffee",
+            "amount": "n/a" if i % 11 == 0 else f"{(i * 37) % 200 - 100}.25",
+        }
+        for i in range(300)
+    ])
+    yield store
+    store.close()
+
+
+@pytest.mark.parametrize("sort", list(SORT_ORDERS))
+def test_cursor_pages_match_a_single_query(store, sort):
+    everything, next_cursor = store.query_transactions(sort=sort, limit=500)
+    assert next_cursor is None
+
+    paged, cursor = [], None
+    while True:
+        page, cursor = store.query_transactions(sort=sort, cursor=cursor, limit=13)
+        paged.extend(page)
+        if cursor is None:
+            break
+
+    assert [tx["id"] for tx in paged] == [tx["id"] for tx in everything]
+
+    column, direction = SORT_ORDERS[sort]
+    values = [tx["date"] if column == "date" else tx["amount_cents"] for tx in everything]
+    present = [value for value in values if value is not None]
+    assert present == sorted(present, reverse=direction == "DESC")
+    # NULLs come first ascending and last descending
+    nulls = values[len(present):] if direction == "DESC" else values[:len(values) - len(present)]
+    assert nulls and all(value is None for value in nulls)
+
+
+@pytest.mark.parametrize("payload", [
+    '["2024-01-01", 1e400]',
+    '["2024-01-01", 1180591620717411303424]',
+    '[1180591620717411303424, 5]',
+    '["2024-01-01", 5.5]',
+    '["2024-01-01", true]',
+    '[{"date": "2024-01-01"}, 5]',
+    '["2024-01-01"]',
+    'not json',
+])
+def test_tampered_cursor_is_rejected(store, payload):
+    cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        store.query_transactions(cursor=cursor)
+
+
+def test_manual_category_survives_sync_and_rule_changes(store):
+    assert store.set_category("acc_1", "txn_1", "Dining")
+    assert not store.set_category("acc_1", "missing", "Dining")
+
+    store.categorize(lambda transactions: ["Coffee"] * len(transactions), rules_version="v1")
+    # A changed description would normally clear the category
+    store.upsert_transactions("acc_1", [
+        {"id": "txn_1", "date": "2024-02-02", "description": "Coffee shop", "amount": "-4.25"}
+    ])
+    store.categorize(lambda transactions: ["Coffee"] * len(transactions), rules_version="v2")
+
+    found, _ = store.query_transactions(search="Dining")
+    assert [tx["id"] for tx in found] == ["txn_1"]
+    assert {tx["category"] for tx in store.get_transactions() if tx["id"] != "txn_1"} == {"Coffee"}
+
+
+def test_revision_sees_writes_from_other_connections(store):
+    # Another worker process using the same database file
+    other = TransactionStore(store.db_path)
+    try:
+        before = store.revision
+        other.upsert_transactions("acc_2", [
+            {"id": "txn_new", "date": "2024-03-01", "description": "Rent", "amount": "-900.00"}
+        ])
+        assert store.revision > before
+
+        before = store.revision
+        assert other.categorize(lambda transactions: ["Housing"] * len(transactions), rules_version="v1")
+        assert store.revision > before
+    finally:
+        other.close()
+
+
+def rollups(store):
+    rows = store._conn.execute(
+        "SELECT month, account_id, category, income_cents, expenses_cents, count FROM monthly_rollups"
+    ).fetchall()
+    return sorted(tuple(row) for row in rows)
+
+
+def grouped_transactions(store):
+    rows = store._conn.execute("""
+        SELECT COALESCE(substr(date, 1, 7), ''), account_id, COALESCE(category, 'Uncategorized'),
+            SUM(MAX(IFNULL(amount_cents, 0), 0)), SUM(MAX(-IFNULL(amount_cents, 0), 0)), COUNT(*)
+        FROM transactions
+        GROUP BY 1, 2, 3
+    """).fetchall()
+    return sorted(tuple(row) for row in rows)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_rollups_match_transactions_after_random_changes(tmp_path, seed):
+    rng = random.Random(seed)
+    store = TransactionStore(str(tmp_path / "transactions.db"))
+    accounts = ["acc_1", "acc_2", "acc_3"]
+    descriptions = ["Coffee", "Rent", "Salary", "Groceries", "Fuel"]
+    categories = ["Dining", "Housing", "Income", "Food", "Transport"]
+
+    def random_transaction(i):
+        return {
+            "id": f"txn_{i}",
+            "date": rng.choice([None, f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"]),
+            "description": rng.choice(descriptions),
+            "amount": rng.choice(["n/a", None, f"{rng.randint(-50000, 50000) / 100:.2f}"]),
+        }
+
+    try:
+        for _ in range(200):
+            action = rng.random()
+            account_id = rng.choice(accounts)
+            if action < 0.4:
+                page = [random_transaction(rng.randrange(60)) for _ in range(rng.randint(1, 10))]
+                store.upsert_transactions(account_id, page)
+            elif action < 0.55:
+                seen = {f"txn_{i}" for i in rng.sample(range(60), 40)}
+                store.finish_sync(account_id, seen, since_date=rng.choice([None, "2024-06-01"]))
+            elif action < 0.8:
+                mapping = dict(zip(descriptions, rng.sample(categories, len(categories))))
+                store.categorize(
+                    lambda transactions: [mapping[tx["description"]] for tx in transactions],
+                    rules_version=str(rng.randrange(3)),
+                    batch_size=7
+                )
+            else:
+                store.set_category(account_id, f"txn_{rng.randrange(60)}", rng.choice(categories))
+
+            assert rollups(store) == grouped_transactions(store)
+        assert rollups(store)
+    finally:
+        store.close()
@@ -0,0 +1,657 @@
+import os
+import json
+import base64
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from category_matcher import parse_cents
+
+
+# Sorts are on the raw columns so the (column, rowid) index order can be used
+# directly; NULLs sort first ascending and last descending
+SORT_ORDERS = {
+    'date_desc': ('date', 'DESC'),
+    'date_asc': ('date', 'ASC'),
+    'amount_desc': ('amount_cents', 'DESC'),
+    'amount_asc': ('amount_cents', 'ASC'),
+}
+TRANSACTION_TYPES = ('all', 'income', 'expense', 'uncategorized')
+SQLITE_INT_MIN, SQLITE_INT_MAX = -2 ** 63, 2 ** 63 - 1
+
+# Add a transaction row (referenced as {row}) to its monthly rollup
+_ROLLUP_ADD = """
+    INSERT INTO monthly_rollups (month, account_id, category, income_cents, expenses_cents, count)
+    VALUES (
+        COALESCE(substr({row}.date, 1, 7), ''), {row}.account_id, COALESCE({row}.category, 'Uncategorized'),
+        MAX(IFNULL({row}.amount_cents, 0), 0), MAX(-IFNULL({row}.amount_cents, 0), 0), 1
+    )
+    ON CONFLICT (month, account_id, category) DO UPDATE SET
+        income_cents = income_cents + excluded.income_cents,
+        expenses_cents = expenses_cents + excluded.expenses_cents,
+        count = count + 1;
+"""
+
+# Take a transaction row back out of its monthly rollup
+_ROLLUP_REMOVE = """
+    UPDATE monthly_rollups SET
+        income_cents = income_cents - MAX(IFNULL({row}.amount_cents, 0), 0),
+        expenses_cents = expenses_cents - MAX(-IFNULL({row}.amount_cents, 0), 0),
+        count = count - 1
+    WHERE month = COALESCE(substr({row}.date, 1, 7), '')
+        AND account_id = {row}.account_id
+        AND category = COALESCE({row}.category, 'Uncategorized');
+    DELETE FROM monthly_rollups
+    WHERE month = COALESCE(substr({row}.date, 1, 7), '')
+        AND account_id = {row}.account_id
+        AND category = COALESCE({row}.category, 'Uncategorized')
+        AND count <= 0;
+"""
+
+
+def _is_sqlite_int(value: Any) -> bool:
+    """Whether value is an int (not a bool) that fits in a SQLite INTEGER"""
+    return isinstance(value, int) and not isinstance(value, bool) and SQLITE_INT_MIN <= value <= SQLITE_INT_MAX
+
+
+class TransactionStore:
+    """
+    Local SQLite copy of Teller transactions, keyed by account and transaction ID.
+    Keeps track of when each account was last synced so Teller only needs to be
+    asked for recent transactions, and stores each transaction's category so
+    transactions can be filtered and paged with indexed queries. A category set
+    by hand (see set_category) takes precedence over the categorization rules.
+    """
+
+    def __init__(self, db_path: str = "transactions.db"):
+        self.db_path = db_path
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._create_tables()
+
+    def _create_tables(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS transactions (
+                    account_id TEXT NOT NULL,
+                    id TEXT NOT NULL,
+                    date TEXT,
+                    status TEXT,
+                    description TEXT,
+                    amount TEXT,
+                    amount_cents INTEGER,
+                    category TEXT,
+                    manual_category TEXT,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (account_id, id)
+                )
+            """)
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(transactions)")}
+            if "category" not in columns:
+                self._conn.execute("ALTER TABLE transactions ADD COLUMN category TEXT")
+            if "manual_category" not in columns:
+                self._conn.execute("ALTER TABLE transactions ADD COLUMN manual_category TEXT")
+            if "amount_cents" not in columns:
+                self._conn.execute("ALTER TABLE transactions ADD COLUMN amount_cents INTEGER")
+                rows = self._conn.execute("SELECT rowid, amount FROM transactions").fetchall()
+                self._conn.executemany(
+                    "UPDATE transactions SET amount_cents = ? WHERE rowid = ?",
+                    [(parse_cents(row["amount"]), row["rowid"]) for row in rows]
+                )
+
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions (date)")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_transactions_account_date ON transactions (account_id, date)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_transactions_category_date ON transactions (category, date)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_transactions_amount ON transactions (amount_cents)")
+            self._create_rollups()
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    account_id TEXT PRIMARY KEY,
+                    latest_date TEXT,
+                    last_synced_at TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            """)
+
+    def _create_rollups(self) -> None:
+        """
+        Per month, account and category income/expense totals, kept up to date
+        by triggers as transactions are inserted, changed, recategorized or
+        deleted, so summaries never rescan the transactions table
+        """
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(monthly_rollups)")}
+        exists = "income_cents" in columns
+        if columns and not exists:
+            # Rollups from before amounts were stored in cents; rebuild them
+            for trigger in ("insert", "delete", "update"):
+                self._conn.execute(f"DROP TRIGGER IF EXISTS transactions_rollup_{trigger}")
+            self._conn.execute("DROP TABLE monthly_rollups")
+
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS monthly_rollups (
+                month TEXT NOT NULL,
+                account_id TEXT NOT NULL,
+                category TEXT NOT NULL,
+                income_cents INTEGER NOT NULL,
+                expenses_cents INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (month, account_id, category)
+            )
+        """)
+        self._conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS transactions_rollup_insert
+            AFTER INSERT ON transactions
+            BEGIN {_ROLLUP_ADD.format(row="NEW")} END
+        """)
+        self._conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS transactions_rollup_delete
+            AFTER DELETE ON transactions
+            BEGIN {_ROLLUP_REMOVE.format(row="OLD")} END
+        """)
+        self._conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS transactions_rollup_update
+            AFTER UPDATE OF date, amount_cents, category, account_id ON transactions
+            WHEN OLD.date IS NOT NEW.date OR OLD.amount_cents IS NOT NEW.amount_cents
+                OR OLD.category IS NOT NEW.category OR OLD.account_id IS NOT NEW.account_id
+            BEGIN {_ROLLUP_REMOVE.format(row="OLD")} {_ROLLUP_ADD.format(row="NEW")} END
+        """)
+
+        if not exists:
+            # Backfill rollups for transactions stored before they existed
+            self._conn.execute("""
+                INSERT INTO monthly_rollups (month, account_id, category, income_cents, expenses_cents, count)
+                SELECT COALESCE(substr(date, 1, 7), ''), account_id, COALESCE(category, 'Uncategorized'),
+                    SUM(MAX(IFNULL(amount_cents, 0), 0)), SUM(MAX(-IFNULL(amount_cents, 0), 0)), COUNT(*)
+                FROM transactions
+                GROUP BY 1, 2, 3
+            """)
+
+    @property
+    def revision(self) -> int:
+        """
+        Counter bumped in the same transaction as every write, by any process
+        using the database, so derived data (e.g. analytics columns) can tell
+        it is stale
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()
+        return int(row["value"]) if row else 0
+
+    def _bump_revision(self) -> None:
+        self._conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('revision', 1) "
+            "ON CONFLICT (key) DO UPDATE SET value = value + 1"
+        )
+
+    def get_sync_state(self, account_id: str) -> Optional[Dict]:
+        """
+        Get the sync bookkeeping for an account
+
+        Returns:
+            Optional[Dict]: latest_date and last_synced_at, or None if never synced
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT latest_date, last_synced_at FROM sync_state WHERE account_id = ?",
+                (account_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def upsert_transactions(self, account_id: str, transactions: List[Dict[str, Any]]) -> None:
+        """
+        Insert or update a batch of transactions for an account
+
+        The amount is parsed into integer cents once here; everything downstream
+        (filters, sorting, rollups, analytics) uses that instead of the string.
+
+        Args:
+            account_id: The account the transactions belong to
+            transactions: Raw transaction dicts from Teller
+        """
+        rows = [
+            (
+                account_id,
+                tx.get("id"),
+                tx.get("date"),
+                tx.get("status"),
+                tx.get("description"),
+                tx.get("amount"),
+                parse_cents(tx.get("amount")),
+                json.dumps(tx)
+            )
+            for tx in transactions
+        ]
+
+        with self._lock, self._conn:
+            self._conn.executemany("""
+                INSERT INTO transactions (account_id, id, date, status, description, amount, amount_cents, data)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (account_id, id) DO UPDATE SET
+                    date = excluded.date,
+                    status = excluded.status,
+                    description = excluded.description,
+                    amount = excluded.amount,
+                    amount_cents = excluded.amount_cents,
+                    data = excluded.data,
+                    category = CASE
+                        WHEN manual_category IS NOT NULL THEN manual_category
+                        WHEN description IS excluded.description AND amount IS excluded.amount
+                        THEN category
+                    END
+            """, rows)
+            self._bump_revision()
+
+    def finish_sync(self,
+                    account_id: str,
+                    seen_ids: Set[str],
+                    since_date: Optional[str] = None) -> None:
+        """
+        Record a completed sync once all of its pages have been upserted
+
+        Args:
+            account_id: The account that was synced
+            seen_ids: IDs of every transaction Teller returned during the sync
+            since_date: Start of the window Teller was asked for (optional). Stored
+                transactions on or after this date that Teller no longer returns,
+                such as pending transactions that posted under a new ID, are removed.
+        """
+        with self._lock, self._conn:
+            if since_date:
+                in_window = self._conn.execute(
+                    "SELECT id FROM transactions WHERE account_id = ? AND date >= ?",
+                    (account_id, since_date)
+                ).fetchall()
+                self._conn.executemany(
+                    "DELETE FROM transactions WHERE account_id = ? AND id = ?",
+                    [(account_id, row["id"]) for row in in_window if row["id"] not in seen_ids]
+                )
+
+            latest_date = self._conn.execute(
+                "SELECT MAX(date) FROM transactions WHERE account_id = ?",
+                (account_id,)
+            ).fetchone()[0]
+            self._conn.execute("""
+                INSERT INTO sync_state (account_id, latest_date, last_synced_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT (account_id) DO UPDATE SET
+                    latest_date = excluded.latest_date,
+                    last_synced_at = excluded.last_synced_at
+            """, (account_id, latest_date, datetime.now().isoformat()))
+            self._bump_revision()
+
+    def iter_transactions(self,
+                          account_ids: Optional[List[str]] = None,
+                          batch_size: int = 500) -> Iterator[List[Dict]]:
+        """
+        Yield stored transactions in batches, newest first
+
+        Each batch is read through its own short-lived connection, picking up
+        after the last row of the previous batch, so no connection is held
+        between batches. That keeps a long iteration from holding up writers
+        (the database runs in WAL mode) and lets successive batches be read
+        from different threads, as happens when a streaming response is
+        consumed by a thread pool.
+
+        Args:
+            account_ids: Only return transactions for these accounts (optional)
+            batch_size: Number of transactions per yielded batch
+
+        Yields:
+            List[Dict]: Transactions as originally returned by Teller
+        """
+        conditions = []
+        params: List[Any] = []
+        if account_ids is not None:
+            conditions.append(f"account_id IN ({','.join('?' * len(account_ids))})")
+            params.extend(account_ids)
+
+        after = None
+        while True:
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            try:
+                rows = self._select_page(conn, conditions, params, 'date_desc', after, batch_size)
+            finally:
+                conn.close()
+            if not rows:
+                return
+            yield [self._row_to_transaction(row["data"], row["category"], row["amount_cents"]) for row in rows]
+            if len(rows) < batch_size:
+                return
+            after = (rows[-1]["sort_value"], rows[-1]["rowid"])
+
+    def get_transactions(self, account_ids: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Get stored transactions, newest first
+
+        Args:
+            account_ids: Only return transactions for these accounts (optional)
+
+        Returns:
+            List[Dict]: Transactions as originally returned by Teller
+        """
+        transactions = []
+        for batch in self.iter_transactions(account_ids):
+            transactions.extend(batch)
+        return transactions
+
+    def iter_columns(self, batch_size: int = 50000) -> Iterator[List[Tuple]]:
+        """
+        Yield (date, amount_cents, category, account_id) tuples for every stored
+        transaction in batches, for building columnar analytics data
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.execute("SELECT date, amount_cents, category, account_id FROM transactions")
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield rows
+        finally:
+            conn.close()
+
+    def _row_to_transaction(self, data: str, category: Optional[str], amount_cents: Optional[int]) -> Dict:
+        tx = json.loads(data)
+        tx["amount_cents"] = amount_cents
+        if category is not None:
+            tx["category"] = category
+        return tx
+
+    def categorize(self,
+                   categorize_many: Callable[[List[Dict]], List[str]],
+                   rules_version: str,
+                   batch_size: int = 1000) -> int:
+        """
+        Fill in stored categories
+
+        Only transactions without a category are categorized, unless the rules
+        changed since the last call, in which case everything is redone.
+        Categories set by hand are never replaced.
+        categorize_many runs without holding the database lock, and a result
+        is not written if the transaction changed in the meantime.
+
+        Args:
+            categorize_many: Maps a list of {description, amount, amount_cents} dicts to category names
+            rules_version: Fingerprint of the current categorization rules
+            batch_size: Number of transactions categorized per database write
+
+        Returns:
+            int: Number of transactions categorized
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'rules_version'").fetchone()
+        redo_all = row is None or row["value"] != rules_version
+
+        where = "AND manual_category IS NULL" + ("" if redo_all else " AND category IS NULL")
+        count = 0
+        last_rowid = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT rowid, description, amount, amount_cents FROM transactions "
+                    f"WHERE rowid > ? {where} ORDER BY rowid LIMIT ?",
+                    (last_rowid, batch_size)
+                ).fetchall()
+            if not rows:
+                break
+            categories = categorize_many(
+                [
+                    {"description": row["description"], "amount": row["amount"], "amount_cents": row["amount_cents"]}
+                    for row in rows
+                ]
+            )
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "UPDATE transactions SET category = ? "
+                    "WHERE rowid = ? AND description IS ? AND amount IS ? AND manual_category IS NULL",
+                    [
+                        (category, row["rowid"], row["description"], row["amount"])
+                        for category, row in zip(categories, rows)
+                    ]
+                )
+                self._bump_revision()
+            count += len(rows)
+            last_rowid = rows[-1]["rowid"]
+
+        if redo_all:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('rules_version', ?)",
+                    (rules_version,)
+                )
+        return count
+
+    def set_category(self, account_id: str, transaction_id: str, category: str) -> bool:
+        """
+        Set a transaction's category by hand. It sticks through later syncs and
+        rule changes, and is what filters, summaries and exports see.
+
+        Returns:
+            bool: False if the transaction isn't stored
+        """
+        with self._lock, self._conn:
+            updated = self._conn.execute(
+                "UPDATE transactions SET manual_category = ?, category = ? WHERE account_id = ? AND id = ?",
+                (category, category, account_id, transaction_id)
+            ).rowcount
+            if updated:
+                self._bump_revision()
+        return bool(updated)
+
+    def query_transactions(self,
+                           start_date: Optional[str] = None,
+                           end_date: Optional[str] = None,
+                           account_ids: Optional[List[str]] = None,
+                           transaction_type: str = 'all',
+                           search: Optional[str] = None,
+                           sort: str = 'date_desc',
+                           cursor: Optional[str] = None,
+                           limit: int = 50) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Get one page of stored transactions matching the given filters
+
+        Pages are addressed by an opaque cursor (keyset pagination), so the
+        cost of a page doesn't depend on how deep into the results it is.
+
+        Args:
+            start_date: Earliest transaction date, inclusive (optional)
+            end_date: Latest transaction date, inclusive (optional)
+            account_ids: Only include these accounts (optional)
+            transaction_type: One of TRANSACTION_TYPES
+            search: Case-insensitive text to find in the description or category (optional)
+            sort: One of SORT_ORDERS
+            cursor: next_cursor from the previous page (optional)
+            limit: Maximum number of transactions to return
+
+        Returns:
+            Tuple[List[Dict], Optional[str]]: The page and the cursor for the next
+            page, or None if this is the last page
+
+        Raises:
+            ValueError: If the sort, type or cursor is invalid
+        """
+        if sort not in SORT_ORDERS:
+            raise ValueError(f"Invalid sort '{sort}'. Expected one of: {', '.join(SORT_ORDERS)}")
+        if transaction_type not in TRANSACTION_TYPES:
+            raise ValueError(
+                f"Invalid type '{transaction_type}'. Expected one of: {', '.join(TRANSACTION_TYPES)}"
+            )
+
+        conditions = []
+        params: List[Any] = []
+
+        if start_date:
+            conditions.append("date >= ?")
+            params.append(start_date)
+        if end_date:
+            conditions.append("date <= ?")
+            params.append(end_date)
+        if account_ids:
+            conditions.append(f"account_id IN ({','.join('?' * len(account_ids))})")
+            params.extend(account_ids)
+        if transaction_type == 'income':
+            conditions.append("amount_cents > 0")
+        elif transaction_type == 'expense':
+            conditions.append("amount_cents < 0")
+        elif transaction_type == 'uncategorized':
+            conditions.append("(category IS NULL OR category = 'Uncategorized')")
+        if search:
+            pattern = "%" + search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            conditions.append("(description LIKE ? ESCAPE '\\' OR category LIKE ? ESCAPE '\\')")
+            params.extend([pattern, pattern])
+        after = self._decode_cursor(cursor) if cursor else None
+
+        with self._lock:
+            rows = self._select_page(self._conn, conditions, params, sort, after, limit + 1)
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = self._encode_cursor(rows[-1]["sort_value"], rows[-1]["rowid"])
+
+        return [
+            self._row_to_transaction(row["data"], row["category"], row["amount_cents"]) for row in rows
+        ], next_cursor
+
+    def _select_page(self,
+                     conn: sqlite3.Connection,
+                     conditions: List[str],
+                     params: List[Any],
+                     sort: str,
+                     after: Optional[Tuple[Any, int]],
+                     limit: int) -> List[sqlite3.Row]:
+        """
+        Select up to limit transactions in the given sort order that come after
+        the (sort value, rowid) key of the previous page
+
+        The key condition is written as a range on the sort column so SQLite
+        can seek straight to it in the index instead of scanning or re-sorting.
+        NULLs can't be part of that range, so in descending order they are
+        read separately once the non-NULL values run out.
+        """
+        column, direction = SORT_ORDERS[sort]
+        op = "<" if direction == "DESC" else ">"
+
+        def select(extra: List[str], extra_params: List[Any], count: int) -> List[sqlite3.Row]:
+            query = f"SELECT rowid, {column} AS sort_value, data, category, amount_cents FROM transactions"
+            if conditions or extra:
+                query += " WHERE " + " AND ".join(conditions + extra)
+            query += f" ORDER BY {column} {direction}, rowid {direction} LIMIT ?"
+            return conn.execute(query, params + extra_params + [count]).fetchall()
+
+        if after is None:
+            return select([], [], limit)
+
+        sort_value, rowid = after
+        if sort_value is None:
+            if direction == "DESC":
+                return select([f"{column} IS NULL AND rowid < ?"], [rowid], limit)
+            return select([f"({column} IS NULL AND rowid > ? OR {column} IS NOT NULL)"], [rowid], limit)
+
+        rows = select(
+            [f"{column} {op}= ? AND ({column} {op} ? OR rowid {op} ?)"],
+            [sort_value, sort_value, rowid],
+            limit
+        )
+        if direction == "DESC" and len(rows) < limit:
+            rows += select([f"{column} IS NULL"], [], limit - len(rows))
+        return rows
+
+    def get_monthly_summary(self,
+                            year: int,
+                            month: int,
+                            account_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Get income, expense and per-category spending totals for one month
+
+        Args:
+            year: Calendar year
+            month: Month number (1-12)
+            account_ids: Only include these accounts (optional)
+
+        Returns:
+            Dict: income and expenses (in dollars and as income_cents /
+            expenses_cents), spending_by_category (largest first) and
+            available_months (every month with transactions, newest first)
+        """
+        account_filter = ""
+        params: List[Any] = [f"{year:04d}-{month:02d}"]
+        if account_ids:
+            account_filter = f" AND account_id IN ({','.join('?' * len(account_ids))})"
+            params.extend(account_ids)
+
+        with self._lock:
+            rows = self._conn.execute(f"""
+                SELECT category, SUM(income_cents) AS income_cents, SUM(expenses_cents) AS expenses_cents
+                FROM monthly_rollups
+                WHERE month = ?{account_filter}
+                GROUP BY category
+                ORDER BY SUM(expenses_cents) DESC
+            """, params).fetchall()
+            months = self._conn.execute(f"""
+                SELECT DISTINCT month FROM monthly_rollups
+                WHERE month != ''{account_filter}
+                ORDER BY month DESC
+            """, params[1:]).fetchall()
+
+        income_cents = sum(row["income_cents"] for row in rows)
+        expenses_cents = sum(row["expenses_cents"] for row in rows)
+
+        return {
+            "income": income_cents / 100,
+            "expenses": expenses_cents / 100,
+            "income_cents": income_cents,
+            "expenses_cents": expenses_cents,
+            "spending_by_category": [
+                {
+                    "category": row["category"],
+                    "amount": row["expenses_cents"] / 100,
+                    "amount_cents": row["expenses_cents"]
+                }
+                for row in rows
+                if row["expenses_cents"] > 0
+            ],
+            "available_months": [
+                {"year": int(row["month"][:4]), "month": int(row["month"][5:7])}
+                for row in months
+            ]
+        }
+
+    def _encode_cursor(self, sort_value: Any, rowid: int) -> str:
+        return base64.urlsafe_b64encode(json.dumps([sort_value, rowid]).encode()).decode()
+
+    def _decode_cursor(self, cursor: str) -> Tuple[Any, int]:
+        try:
+            sort_value, rowid = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (ValueError, TypeError, OverflowError) as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
+        # Sort values are dates or cents and rowids are SQLite integers, so
+        # anything else was tampered with and would fail inside the query
+        if not (sort_value is None or isinstance(sort_value, str) or _is_sqlite_int(sort_value)):
+            raise ValueError(f"Invalid cursor: {cursor}")
+        if not _is_sqlite_int(rowid):
+            raise ValueError(f"Invalid cursor: {cursor}")
+        return sort_value, rowid
+
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
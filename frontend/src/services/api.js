@@ -9,6 +9,35 @@ const api = axios.create({
   },
 });
 
+// Read a newline-delimited JSON response, calling onLines with each chunk of parsed lines
+async function readNdjson(path, params, onLines) {
+  const url = new URL(`${api.defaults.baseURL}${path}`, window.location.origin);
+  Object.entries(params).forEach(([key, value]) => url.searchParams.set(key, value));
+
+  const response = await fetch(url);
+  if (!response.ok) {
+    throw new Error(`Request failed with status ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { done, value } = await reader.read();
+    buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+
+    const lines = buffer.split("\n");
+    buffer = done ? "" : lines.pop();
+    const parsed = lines.filter((line) => line.trim()).map((line) => JSON.parse(line));
+    if (parsed.length > 0) {
+      onLines(parsed);
+    }
+
+    if (done) break;
+  }
+}
+
 // API Service object with methods for each endpoint
 export const apiService = {
   // Teller tokens and bank connection
@@ -22,9 +51,13 @@ export const apiService = {
     return response.data;
   },
 
-  async deleteTellerToken(institutionName) {
+  // Deletes the institution's default (most recently connected) enrollment
+  // unless enrollmentId is given
+  async deleteTellerToken(institutionName, enrollmentId) {
+    const params = enrollmentId ? { enrollment_id: enrollmentId } : {};
     const response = await api.delete(
-      `/teller/tokens/${encodeURIComponent(institutionName)}`
+      `/teller/tokens/${encodeURIComponent(institutionName)}`,
+      { params }
     );
     return response.data;
   },
@@ -53,6 +86,68 @@ export const apiService = {
     return response.data;
   },
 
+  // Stream an account's transactions, calling onRows as each chunk arrives
+  async streamTransactions(accountId, institution, onRows) {
+    const params = { stream: true };
+    if (institution) params.institution = institution;
+    await readNdjson(`/accounts/${accountId}/transactions`, params, onRows);
+  },
+
+  // Transactions for every connected account, fetched concurrently by the backend
+  async listAllTransactions() {
+    const response = await api.get("/transactions/all", { timeout: 60000 });
+    return response.data;
+  },
+
+  // Streaming version of listAllTransactions: onHeader receives the accounts
+  // and errors, then onRows is called as chunks of transactions arrive
+  async streamAllTransactions(onHeader, onRows) {
+    let headerSeen = false;
+    await readNdjson("/transactions/all", { stream: true }, (lines) => {
+      if (!headerSeen) {
+        headerSeen = true;
+        onHeader(lines.shift());
+      }
+      if (lines.length > 0) onRows(lines);
+    });
+  },
+
+  // Sync every connected account into the backend's local store
+  async syncTransactions(refresh = false) {
+    const response = await api.post("/transactions/sync", null, {
+      params: { refresh },
+      timeout: 60000,
+    });
+    return response.data;
+  },
+
+  // One page of synced transactions, filtered and sorted by the backend.
+  // Pass the returned next_cursor as params.cursor to get the next page.
+  async queryTransactions(params) {
+    const response = await api.get("/transactions", { params });
+    return response.data;
+  },
+
+  // Every transaction matching the query, fetched page by page
+  async queryAllTransactions(params) {
+    const transactions = [];
+    let cursor = null;
+    do {
+      const { data } = await api.get("/transactions", {
+        params: { ...params, limit: 500, ...(cursor ? { cursor } : {}) },
+      });
+      transactions.push(...data.transactions);
+      cursor = data.next_cursor;
+    } while (cursor);
+    return transactions;
+  },
+
+  // Monthly totals and spending per category (month is 1-12)
+  async getSummary(year, month) {
+    const response = await api.get("/summary", { params: { year, month } });
+    return response.data;
+  },
+
   async categorizeTransactions(transactions) {
     // Make sure each transaction has an account_name field
     const processedTransactions = transactions.map((tx) => {
@@ -72,6 +167,16 @@ export const apiService = {
     return response.data;
   },
 
+  // Set a synced transaction's category by hand; the backend keeps it through
+  // later syncs and rule changes, so queries and exports include it
+  async setTransactionCategory(accountId, transactionId, category) {
+    const response = await api.put(
+      `/transactions/${encodeURIComponent(accountId)}/${encodeURIComponent(transactionId)}/category`,
+      { category }
+    );
+    return response.data;
+  },
+
   async exportTransactions(data) {
     // Make sure the data is in the correct format expected by the API
     // The API expects { transactions: [...] } where transactions is an array
@@ -79,8 +184,17 @@ export const apiService = {
       transactions: Array.isArray(data.transactions) ? data.transactions : [],
     };
 
-    const response = await api.post("/transactions/export", formattedData);
-    return response.data;
+    // The export runs in the background; poll the job until it finishes
+    let { data: job } = await api.post("/transactions/export", formattedData);
+    while (job.status === "queued" || job.status === "running") {
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+      ({ data: job } = await api.get(`/transactions/export/${job.id}`));
+    }
+
+    if (job.status === "failed") {
+      throw new Error(job.error || "Export failed");
+    }
+    return job.result;
   },
 
   // Categories
@@ -124,6 +238,16 @@ export const apiService = {
     );
     return response.data;
   },
+
+  // Apply many mapping changes at once. upsert is a list of
+  // { pattern, category_id, type, min_amount, max_amount }, remove a list of patterns
+  async applyMappingChanges(upsert = [], remove = []) {
+    const response = await api.post("/mappings/bulk", {
+      upsert,
+      delete: remove,
+    });
+    return response.data;
+  },
 };
 
 // Add response interceptor for error handling
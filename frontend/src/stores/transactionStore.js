@@ -8,6 +8,8 @@ export const useTransactionStore = defineStore("transaction", {
     filteredTransactions: [],
     categories: [],
     categoryMappings: {},
+    // Totals for the current month, computed by the backend
+    summary: null,
     currentMonth: new Date().getMonth(),
     currentYear: new Date().getFullYear(),
     loading: false,
@@ -29,47 +31,13 @@ export const useTransactionStore = defineStore("transaction", {
     },
 
     // Get spending by category for current month
-    spendingByCategory: (state) => {
-      const transactions = state.currentMonthTransactions;
-      const spendingMap = {};
-
-      transactions.forEach((tx) => {
-        // Only count expenses (negative amounts)
-        if (parseFloat(tx.amount) < 0) {
-          const category = tx.category || "Uncategorized";
-          const amount = Math.abs(parseFloat(tx.amount));
-
-          if (spendingMap[category]) {
-            spendingMap[category] += amount;
-          } else {
-            spendingMap[category] = amount;
-          }
-        }
-      });
-
-      // Convert to array for easier rendering in charts
-      return Object.entries(spendingMap).map(([category, amount]) => ({
-        category,
-        amount,
-        // Find the color for this category
-        color:
-          state.categories.find((c) => c.name === category)?.color || "#9CA3AF",
-      }));
-    },
+    spendingByCategory: (state) => state.summary?.spending_by_category || [],
 
     // Get total income for current month
-    totalIncome: (state) => {
-      return state.currentMonthTransactions
-        .filter((tx) => parseFloat(tx.amount) > 0)
-        .reduce((sum, tx) => sum + parseFloat(tx.amount), 0);
-    },
+    totalIncome: (state) => state.summary?.income || 0,
 
     // Get total expenses for current month
-    totalExpenses: (state) => {
-      return state.currentMonthTransactions
-        .filter((tx) => parseFloat(tx.amount) < 0)
-        .reduce((sum, tx) => sum + Math.abs(parseFloat(tx.amount)), 0);
-    },
+    totalExpenses: (state) => state.summary?.expenses || 0,
 
     // Get uncategorized transactions
     uncategorizedTransactions: (state) => {
@@ -80,30 +48,14 @@ export const useTransactionStore = defineStore("transaction", {
 
     // For month selection in the UI
     availableMonths: (state) => {
-      const months = new Set();
-
-      state.transactions.forEach((tx) => {
-        const date = new Date(tx.date);
-        const monthYear = `${date.getFullYear()}-${date.getMonth()}`;
-        months.add(monthYear);
-      });
-
-      return Array.from(months)
-        .map((monthYear) => {
-          const [year, month] = monthYear.split("-");
-          return {
-            year: parseInt(year),
-            month: parseInt(month),
-            label: new Date(parseInt(year), parseInt(month)).toLocaleDateString(
-              undefined,
-              { month: "long", year: "numeric" }
-            ),
-          };
-        })
-        .sort((a, b) => {
-          if (a.year !== b.year) return b.year - a.year;
-          return b.month - a.month;
-        });
+      return (state.summary?.available_months || []).map(({ year, month }) => ({
+        year,
+        month: month - 1,
+        label: new Date(year, month - 1).toLocaleDateString(undefined, {
+          month: "long",
+          year: "numeric",
+        }),
+      }));
     },
   },
 
@@ -139,6 +91,58 @@ export const useTransactionStore = defineStore("transaction", {
       }
     },
 
+    // Load transactions and accounts for every connected institution in one request.
+    // Rows are streamed so the list renders progressively on long histories.
+    async fetchAllTransactions() {
+      this.loading = true;
+      this.error = null;
+      this.transactions = [];
+
+      try {
+        const bankStore = useBankStore();
+
+        await apiService.streamAllTransactions(
+          ({ accounts, errors }) => {
+            bankStore._allAccounts = accounts;
+
+            if (errors.length > 0) {
+              this.error = errors
+                .map((err) =>
+                  err.account_id
+                    ? `Failed to load transactions for account ${err.account_id}`
+                    : `Failed to load accounts for ${err.institution}`
+                )
+                .join(". ");
+            }
+          },
+          (rows) => {
+            this.transactions.push(...rows);
+          }
+        );
+
+        this.filteredTransactions = [...this.transactions];
+        await this.fetchSummary();
+      } catch (err) {
+        this.error = err.message || "Failed to fetch transactions";
+        console.error(this.error);
+      } finally {
+        this.loading = false;
+      }
+    },
+
+    // Load income, expense and category totals for the current month
+    async fetchSummary() {
+      try {
+        this.summary = await apiService.getSummary(
+          this.currentYear,
+          this.currentMonth + 1
+        );
+      } catch (err) {
+        this.error = err.message || "Failed to fetch monthly summary";
+        console.error(this.error);
+      }
+    },
+
     // Set loading state directly
     setLoading(state) {
       this.loading = state;
@@ -201,22 +205,13 @@ export const useTransactionStore = defineStore("transaction", {
       // Update locally first for immediate UI feedback
       transaction.category = categoryName;
 
-      // Get account name for the transaction
-      const account = this.getAccountById(transaction.account_id);
-      const accountName = account
-        ? `${account.institution?.name || "Unknown"} - ${account.name} (${
-            account.last_four
-          })`
-        : "Unknown Account";
-
-      // Then send to API with both account_id and account_name
+      // Then save it in the backend store so it survives syncs and rule changes
       try {
-        const txWithAccountName = {
-          ...transaction,
-          account_name: accountName,
-        };
-
-        await apiService.categorizeTransactions([txWithAccountName]);
+        await apiService.setTransactionCategory(
+          transaction.account_id,
+          transaction.id,
+          categoryName
+        );
       } catch (err) {
         this.error = err.message || "Failed to categorize transaction";
         console.error(this.error);
@@ -289,6 +284,7 @@ export const useTransactionStore = defineStore("transaction", {
       } else {
         this.currentMonth++;
       }
+      this.fetchSummary();
     },
 
     setPreviousMonth() {
@@ -298,6 +294,7 @@ export const useTransactionStore = defineStore("transaction", {
       } else {
         this.currentMonth--;
       }
+      this.fetchSummary();
     },
 
     filterTransactions(searchText) {